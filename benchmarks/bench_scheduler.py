@@ -0,0 +1,204 @@
+import argparse, json, random, sys, time, tracemalloc
+from datetime import date, timedelta
+
+from studytracker import roster
+from studytracker.optimize import schedule_deadline, schedule_quality
+from studytracker.records import to_records
+from studytracker.scheduler import (
+    JENIS, ScheduleIndex, find_slot_for_task, get_tasks_occupied_for_date, hitung_bobot_prioritas,
+    hitung_waktu_belajar, schedule_batch, schedule_cohort, sort_queue,
+)
+from studytracker.timeutil import IDX_TO_DAY, merge_intervals, minutes_to_hm
+
+# Usage (from the repo root):
+#   python -m benchmarks.bench_scheduler
+#   python -m benchmarks.bench_scheduler --tasks 1000 10000 100000 1000000 --queue 10 1000 10000 --out bench_output.txt
+# One JSON object per line: seconds, ops_per_s and (unless --no-memory) peak_kib from tracemalloc.
+
+START = date(2026, 1, 5)
+
+
+# -------------------------
+# Synthetic data
+# -------------------------
+def make_cohort(rng, users):
+    # same shape as buat_database_mahasiswa(): 1-3 two-hour classes on each weekday
+    db = {}
+    for i in range(users):
+        jadwal = {}
+        for wd in range(5):
+            hours = rng.sample(range(7, 17, 2), rng.randint(1, 3))
+            jadwal[IDX_TO_DAY[wd]] = [f"{h:02d}:00-{h+2:02d}:00" for h in sorted(hours)]
+        db[f"9{i:07d}"] = {"nama": f"Mahasiswa {i}", "jadwal_kuliah": jadwal}
+    return db
+
+def make_tasks(rng, n, nims, days):
+    tasks = []
+    for i in range(n):
+        dur = rng.choice((30, 60, 90))
+        s = rng.randrange(6*60, 24*60 - dur + 1, 15)
+        tasks.append({
+            "id": f"t{i}",
+            "mapel": f"Mapel {i % 50}",
+            "jenis": rng.choice(JENIS),
+            "date": (START + timedelta(days=rng.randrange(days))).isoformat(),
+            "start": minutes_to_hm(s),
+            "end": minutes_to_hm(s + dur),
+            "duration_minutes": dur,
+            "user_nim": rng.choice(nims),
+            "created_at": "2026-01-01T00:00:00",
+        })
+    return tasks
+
+def make_queue(rng, n, nims, days):
+    queue = []
+    for i in range(n):
+        prior, kes = rng.randint(1, 4), rng.randint(1, 4)
+        req = START + timedelta(days=rng.randrange(days))
+        queue.append({
+            "id": f"q{i}",
+            "mapel": f"Mapel {i % 50}",
+            "jenis": rng.choice(JENIS),
+            "requested_date": req.isoformat(),
+            "deadline": (req + timedelta(days=rng.randint(1, 30))).isoformat() if rng.random() < 0.7 else "",
+            "prioritas": prior,
+            "kesulitan": kes,
+            "bobot": hitung_bobot_prioritas(prior, kes),
+            "duration_minutes": hitung_waktu_belajar(kes),
+            "user_nim": rng.choice(nims),
+            "created_at": "2026-01-01T00:00:00",
+        })
+    return queue
+
+# -------------------------
+# Runner
+# -------------------------
+def measure(fn, memory):
+    t0 = time.perf_counter()
+    ops = fn()
+    seconds = time.perf_counter() - t0
+    row = {"seconds": round(seconds, 6), "ops": ops, "ops_per_s": round(ops / seconds, 1) if seconds else None}
+    if memory:
+        # second run under tracemalloc so the timing above is not slowed by tracing
+        tracemalloc.start()
+        fn()
+        row["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return row
+
+def run(args, emit):
+    rng = random.Random(args.seed)
+    cohort = make_cohort(rng, args.users)
+    roster.DB.update(cohort)
+    roster.invalidate_timetables()
+    nims = list(cohort)
+    for n_tasks in args.tasks:
+        days = max(args.days, n_tasks // args.per_day)
+        tasks = make_tasks(rng, n_tasks, nims, days)
+        base = {"tasks": n_tasks, "users": args.users, "days": days}
+
+        def build():
+            ScheduleIndex(tasks)
+            return len(tasks)
+        emit(dict(base, bench="index_build", **measure(build, args.memory)))
+        index = ScheduleIndex(tasks)
+
+        # parse once into TaskRecords (peak_kib ~ the records' footprint), then index those
+        def parse():
+            to_records(tasks)
+            return len(tasks)
+        emit(dict(base, bench="task_records", **measure(parse, args.memory)))
+        records = to_records(tasks)
+        def build_records():
+            ScheduleIndex(records)
+            return len(records)
+        emit(dict(base, bench="index_build_records", **measure(build_records, args.memory)))
+
+        probe = [START + timedelta(days=rng.randrange(days)) for _ in range(args.probes)]
+        # the unindexed scan is linear in the store; cap it on big stores
+        scan_probe = probe[:max(1, min(args.probes, 200_000 // max(n_tasks, 1)))]
+
+        def occupied():
+            for d in scan_probe:
+                get_tasks_occupied_for_date(tasks, d)
+            return len(scan_probe)
+        emit(dict(base, bench="get_tasks_occupied_for_date", **measure(occupied, args.memory)))
+
+        day_lists = [index.busy_for_user(nims[i % len(nims)], d) + roster.get_class_occupied_for_date(nims[i % len(nims)], d)
+                     for i, d in enumerate(probe)]
+        def merge():
+            for occ in day_lists:
+                merge_intervals(occ)
+            return len(day_lists)
+        emit(dict(base, bench="merge_intervals", intervals=sum(map(len, day_lists)), **measure(merge, args.memory)))
+
+        lookups = [(nims[i % len(nims)], d, rng.choice((30, 60, 90))) for i, d in enumerate(probe)]
+        def slots():
+            for nim, d, dur in lookups:
+                find_slot_for_task(tasks, nim, d, dur, max_days=args.max_days, index=index)
+            return len(lookups)
+        emit(dict(base, bench="find_slot_for_task", max_days=args.max_days, **measure(slots, args.memory)))
+
+        for n_queue in args.queue:
+            queue = make_queue(rng, n_queue, nims, args.queue_days or days)
+            placed = []
+            def generate():
+                # what "Generate & Simpan" does between reading the store and writing it back
+                placed[:] = schedule_batch(ScheduleIndex(tasks), sort_queue(queue), max_days=args.max_days)[0]
+                return len(queue)
+            row = measure(generate, args.memory)
+            greedy = schedule_batch(ScheduleIndex(tasks), sort_queue(queue), max_days=args.max_days)
+            emit(dict(base, bench="generate_batch", queue=n_queue, max_days=args.max_days, placed=len(placed), **row,
+                      quality=schedule_quality(queue, *greedy)))
+
+            result = []
+            def generate_deadline():
+                result[:] = schedule_deadline(ScheduleIndex(tasks), sort_queue(queue), max_days=args.max_days,
+                                              budget=args.budget)
+                return len(queue)
+            row = measure(generate_deadline, args.memory)
+            emit(dict(base, bench="generate_deadline", queue=n_queue, max_days=args.max_days, budget=args.budget,
+                      placed=len(result[0]), **row, quality=schedule_quality(queue, *result)))
+
+            if args.workers != 1:
+                def generate_cohort():
+                    placed[:] = schedule_cohort(tasks, sort_queue(queue), max_days=args.max_days,
+                                                workers=args.workers or None)[0]
+                    return len(queue)
+                # tracemalloc only sees the parent process here
+                row = measure(generate_cohort, False)
+                emit(dict(base, bench="generate_cohort", queue=n_queue, max_days=args.max_days, workers=args.workers,
+                          placed=len(placed), **row))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Scheduler throughput and memory on synthetic cohorts.")
+    ap.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000, 100000], help="stored task counts")
+    ap.add_argument("--queue", type=int, nargs="+", default=[10, 100, 1000], help="queue sizes for the Generate batch")
+    ap.add_argument("--users", type=int, default=200, help="cohort size")
+    ap.add_argument("--days", type=int, default=365, help="minimum calendar span in days")
+    ap.add_argument("--per-day", type=int, default=40, help="stored tasks per calendar day (widens the span)")
+    ap.add_argument("--probes", type=int, default=200, help="calls per single-call benchmark")
+    ap.add_argument("--max-days", type=int, default=60)
+    ap.add_argument("--workers", type=int, default=1, help="also time schedule_cohort with N processes (0 = every core)")
+    ap.add_argument("--queue-days", type=int, help="spread requested dates over this many days (default: the calendar span);"
+                    " a short span crowds the queue and makes deadlines bite")
+    ap.add_argument("--budget", type=float, default=0.5, help="seconds per generate_deadline run")
+    ap.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc pass")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="also append the JSON lines to this file")
+    args = ap.parse_args(argv)
+
+    out = open(args.out, "a", encoding="utf-8") if args.out else None
+    def emit(row):
+        line = json.dumps(row)
+        print(line, flush=True)
+        if out:
+            out.write(line + "\n")
+    try:
+        run(args, emit)
+    finally:
+        if out:
+            out.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
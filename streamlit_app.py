@@ -1,222 +1,201 @@
 import streamlit as st
 import pandas as pd
-import json, os, uuid
+import json
+from contextlib import contextmanager
 from datetime import date, datetime as dt, timedelta
 
+from studytracker import metrics
+from studytracker.analytics import MAX_DAYS as AVAILABILITY_MAX_DAYS, availability
+from studytracker.export import EXPORT_FORMATS, export_bytes
+from studytracker.importer import import_queue, import_timetables
+from studytracker.optimize import schedule_quality
+from studytracker.recurring import make_rule
+from studytracker.reminders import ReminderQueue
+from studytracker.replan import NoOwnerError, replan
+from studytracker.roster import DB, load_roster, roster_revision
+from studytracker.scheduler import (
+    JENIS, MAX_DAYS_AHEAD_DEFAULT, find_group_slots, gen_id, generate, hitung_bobot_prioritas, hitung_waktu_belajar,
+)
+from studytracker.storage import (
+    DATA_FILE, STORAGE_BACKEND, USERS_FILE, ConflictError, WriteBehindError, WriteBehindStore, ensure_files_exist,
+    get_task_store,
+)
+from studytracker.timeutil import WEEKDAY_MAP, convert_weekday_to_date, parse_iso_date
 
-DATA_FILE = "tasks.json"   
-USERS_FILE = "users.json"  
-ALARM_URL = "https://actions.google.com/sounds/v1/alarms/alarm_clock.ogg" 
-
-DEFAULT_NIGHT_START = 19 * 60
-DEFAULT_NIGHT_END = 24 * 60
-MAX_DAYS_AHEAD_DEFAULT = 60
 
+ALARM_URL = "https://actions.google.com/sounds/v1/alarms/alarm_clock.ogg" 
+PAGE_SIZES = [25, 50, 100, 200]
+TABLE_COLS = ["id","mapel","jenis","date","start","end","duration_minutes","user_nim"]
+TIMELINE_MAX_BARS = 300   # more tasks than this in the window: daily totals instead of bars
 
-def ensure_files_exist():
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
-    if not os.path.exists(USERS_FILE):
-        # create users.json from demo DB (optional)
-        with open(USERS_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f)
+@st.cache_resource
+def init_files():
+    # once per server process instead of on every rerun
+    ensure_files_exist()
+    load_roster()
 
-ensure_files_exist()
+init_files()
 
 # -------------------------
-# Demo database (jadwal kuliah)
+# Cached reads
 # -------------------------
-def buat_database_mahasiswa():
-    return {
-        "16725186": {
-            "nama": "Jean Fide Tjahjamuljo",
-            "jadwal_kuliah": {
-                "Senin": ["08:00-10:00", "13:00-15:00"],
-                "Selasa": ["10:00-12:00"],
-                "Rabu": ["08:00-10:00", "15:00-17:00"],
-                "Kamis": ["13:00-15:00"],
-                "Jumat": ["10:00-12:00"]
-            }
-        },
-        "16725193": {
-            "nama": "Farel Ahmad",
-            "jadwal_kuliah": {
-                "Senin": ["10:00-12:00"],
-                "Selasa": ["08:00-10:00", "13:00-15:00"],
-                "Rabu": ["10:00-12:00"],
-                "Kamis": ["08:00-10:00", "15:00-17:00"],
-                "Jumat": ["13:00-15:00"]
-            }
-        },
-        "16725305": {
-            "nama": "Nindya Cettakirana Bintoro",
-            "jadwal_kuliah": {
-                "Senin": ["08:00-10:00"],
-                "Selasa": ["10:00-12:00", "15:00-17:00"],
-                "Rabu": ["13:00-15:00"],
-                "Kamis": ["08:00-10:00", "13:00-15:00"],
-                "Jumat": ["10:00-12:00"]
-            }
-        },
-        "16725494": {
-            "nama": "Louis Sergio Fredly",
-            "jadwal_kuliah": {
-                "Senin": ["08:00-10:00", "13:00-15:00"],
-                "Selasa": ["10:00-12:00"],
-                "Rabu": ["08:00-10:00", "15:00-17:00"],
-                "Kamis": ["13:00-15:00"],
-                "Jumat": ["10:00-12:00"]
-            }
-        },
-        "16725424": {
-            "nama": "Felicya Ribka Zafeena",
-            "jadwal_kuliah": {
-                "Senin": ["08:00-10:00", "13:00-15:00"],
-                "Selasa": ["10:00-12:00"],
-                "Rabu": ["08:00-10:00", "15:00-17:00"],
-                "Kamis": ["13:00-15:00"],
-                "Jumat": ["10:00-12:00"]
-            }
-        },
-    }
-
-DB = buat_database_mahasiswa()
+# Streamlit reruns this script on every interaction; these are keyed on the
+# store version, so reruns without writes skip disk and DataFrame building.
+# Results are shared between reruns: treat them as read-only. With metrics on,
+# the bodies count cache misses ("ui.<name>.misses") for the Diagnostik page.
+@st.cache_resource(max_entries=32)
+def cached_page(version, user_nim, date_from, date_to, jenis, offset, limit):
+    if metrics.ENABLED: metrics.count("ui.cached_page.misses")
+    return get_task_store().page(user_nim, date_from, date_to, jenis, offset, limit)
+
+@st.cache_resource(max_entries=8)
+def cached_window(version, user_nim, date_from, date_to, jenis):
+    if metrics.ENABLED: metrics.count("ui.cached_window.misses")
+    return get_task_store().query(user_nim, date_from, date_to, jenis)
+
+@st.cache_resource(max_entries=8)
+def cached_availability(version, roster_rev, user_nim, date_from, date_to, night_start, night_end):
+    # user_nim None: the whole roster plus everyone with tasks in the window
+    if metrics.ENABLED: metrics.count("ui.cached_availability.misses")
+    records = get_task_store().records(user_nim or None, date_from, date_to)
+    nims = [user_nim] if user_nim else sorted(set(DB) | {r.get("user_nim") for r in records if r.get("user_nim")})
+    return availability(records, nims, date_from, date_to, night_start, night_end)
+
+@st.cache_resource
+def get_reminders():
+    # one heap per user, kept in step with the store's writes (studytracker/reminders.py)
+    return ReminderQueue(get_task_store())
 
 # -------------------------
-# Persistence helpers
+# Task views
 # -------------------------
-def load_tasks():
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_tasks(tasks):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(tasks, f, ensure_ascii=False, indent=2, default=str)
-
-# -------------------------
-# Time helpers
-# -------------------------
-def hm_to_minutes(hm):
-    h, m = map(int, hm.split(":"))
-    return h*60 + m
-
-def minutes_to_hm(minutes):
-    h = minutes // 60
-    m = minutes % 60
-    return f"{h:02d}:{m:02d}"
-
-def parse_iso_date(s):
-    try:
-        return dt.strptime(s, "%Y-%m-%d").date()
-    except:
-        return None
-
-# -------------------------
-# Scheduling logic
-# -------------------------
-WEEKDAY_MAP = {"Senin":0,"Selasa":1,"Rabu":2,"Kamis":3,"Jumat":4,"Sabtu":5,"Minggu":6}
-IDX_TO_DAY = {v:k for k,v in WEEKDAY_MAP.items()}
-
-def convert_weekday_to_date(weekday, week_number, month, year):
-    weekday = weekday.capitalize()
-    if weekday not in WEEKDAY_MAP:
+# filtering and paging happen here, only the visible page goes to the browser
+def task_filters(key):
+    col1, col2, col3 = st.columns(3)
+    only_mine = col1.checkbox("Hanya tugas saya", value=bool(st.session_state.user_nim),
+                              disabled=not st.session_state.user_nim, key=key + "_mine")
+    jenis = col2.selectbox("Jenis", ["semua"] + JENIS, key=key + "_jenis")
+    date_from = date_to = None
+    if col3.checkbox("Filter tanggal", key=key + "_by_date"):
+        c1, c2 = st.columns(2)
+        date_from = c1.date_input("Dari tanggal", key=key + "_from")
+        date_to = c2.date_input("Sampai tanggal", value=date_from + timedelta(days=30), key=key + "_to")
+    return {"user_nim": st.session_state.user_nim if only_mine else None, "date_from": date_from,
+            "date_to": date_to, "jenis": None if jenis == "semua" else jenis}
+
+def task_table(version, filters, key):
+    # returns the rows shown (None when nothing matches)
+    col1, col2 = st.columns(2)
+    size = col1.selectbox("Baris per halaman", PAGE_SIZES, index=1, key=key + "_size")
+    rows, total = cached_page(version, offset=0, limit=size, **filters)
+    if not total:
         return None
-    target = WEEKDAY_MAP[weekday]
+    pages = (total + size - 1) // size
+    page = col2.number_input(f"Halaman (dari {pages})", min_value=1, max_value=pages, value=1, key=key + "_page")
+    if page > 1:
+        rows, total = cached_page(version, offset=(page - 1) * size, limit=size, **filters)
+    st.dataframe(pd.DataFrame(rows, columns=TABLE_COLS))
+    st.caption(f"{total} tugas, halaman {page} dari {pages}")
+    return rows
+
+def task_timeline(version, filters, rows):
+    # a week or month window; past TIMELINE_MAX_BARS tasks it shows minutes per day and user
+    import plotly.express as px
+    col1, col2 = st.columns(2)
+    span = col1.radio("Rentang", ["Minggu", "Bulan"], horizontal=True)
+    anchor = col2.date_input("Mulai", value=filters["date_from"] or parse_iso_date(rows[0]["date"]) or date.today())
+    lo = max(anchor, filters["date_from"] or anchor)
+    hi = anchor + timedelta(days=6 if span == "Minggu" else 29)
+    hi = min(hi, filters["date_to"] or hi)
+    window = cached_window(version, filters["user_nim"], lo, hi, filters["jenis"])
+    if not window:
+        st.info("Tidak ada tugas di rentang ini.")
+        return
+    df_plot = pd.DataFrame(window)
+    df_plot["user_nim"] = df_plot["user_nim"].fillna("-")
+    if len(df_plot) > TIMELINE_MAX_BARS:
+        per_day = df_plot.groupby(["date", "user_nim"], as_index=False)["duration_minutes"].sum()
+        fig = px.bar(per_day, x="date", y="duration_minutes", color="user_nim",
+                     title=f"Menit belajar per hari ({len(df_plot)} tugas)")
+    else:
+        df_plot["start_dt"] = pd.to_datetime(df_plot["date"] + " " + df_plot["start"])
+        df_plot["end_dt"] = pd.to_datetime(df_plot["date"] + " " + df_plot["end"])
+        fig = px.timeline(df_plot, x_start="start_dt", x_end="end_dt", y="mapel", color="user_nim", title="Timeline Jadwal")
+        fig.update_yaxes(autorange="reversed")
+    st.plotly_chart(fig, width="stretch")
+
+def show_replan(diff):
+    # what replan() changed; items taken from the queue leave it
+    if diff["added"]:
+        added = {t["id"] for t in diff["added"]}
+        st.session_state.queue = [it for it in st.session_state.queue if it["id"] not in added]
+    for t in diff["updated"] + diff["added"]:
+        st.write(f"{t['mapel']} -> {t['date']} {t['start']}-{t['end']}")
+    st.caption(f"{len(diff['updated'])} tugas dipindah, {len(diff['added'])} dari antrean, {len(diff['deleted'])} dihapus.")
+
+@contextmanager
+def saving(items=()):
+    # a write that still lost to another session after transact()'s retries:
+    # nothing was saved, the rest of the action is skipped. With write-behind the
+    # action's writes may still be queued here: check_writes() reports them on a
+    # later rerun and gives back the queue items (and items) the action took
+    before = list(st.session_state.queue)
     try:
-        d = date(year, month, 1)
-    except:
-        return None
-    count = 0
-    while d.month == month:
-        if d.weekday() == target:
-            count += 1
-            if count == week_number:
-                return d
-        d += timedelta(days=1)
-    return None
-
-def merge_intervals(intervals):
-    if not intervals:
-        return []
-    intervals = sorted(intervals, key=lambda x: x[0])
-    merged = [list(intervals[0])]
-    for s,e in intervals[1:]:
-        if s <= merged[-1][1]:
-            merged[-1][1] = max(merged[-1][1], e)
-        else:
-            merged.append([s,e])
-    return merged
-
-def get_class_occupied_for_date(nim, target_date):
-    occ = []
-    if not nim or nim not in DB:
-        return occ
-    jadwal = DB[nim].get("jadwal_kuliah", {})
-    hari = IDX_TO_DAY[target_date.weekday()]
-    for times in jadwal.get(hari, []):
-        try:
-            s,e = times.split("-")
-            occ.append([hm_to_minutes(s), hm_to_minutes(e)])
-        except:
-            continue
-    return occ
-
-def get_tasks_occupied_for_date(all_tasks, target_date, ignore_task_id=None):
-    occ = []
-    for t in all_tasks:
-        if ignore_task_id and t.get("id") == ignore_task_id:
-            continue
-        try:
-            if parse_iso_date(t.get("date")) == target_date:
-                occ.append([hm_to_minutes(t["start"]), hm_to_minutes(t["end"])])
-        except:
+        yield
+    except ConflictError:
+        st.error("Data tugas baru saja diubah di sesi lain, jadi tidak ada yang disimpan. Coba lagi.")
+    except WriteBehindError:
+        st.error("Penyimpanan sedang lambat, jadi tidak ada yang disimpan. Coba lagi sebentar lagi.")
+    except NoOwnerError:
+        st.error("Tugas ini tidak punya pemilik (user_nim). Login dulu untuk mengubahnya.")
+    store = get_task_store()
+    if isinstance(store, WriteBehindStore):
+        tickets = store.take_tickets()
+        if tickets:
+            left = {it["id"] for it in st.session_state.queue}
+            st.session_state.pending_writes.append((tickets, [it for it in before if it["id"] not in left] + list(items)))
+
+def check_writes():
+    # writes of earlier actions that were dropped after the action reported success
+    still = []
+    for tickets, taken in st.session_state.pending_writes:
+        if not all(t.done() for t in tickets):
+            still.append((tickets, taken))
             continue
-    return occ
-
-def find_slot_for_task(all_tasks, nim, requested_date, duration_minutes, ignore_task_id=None,
-                       night_start=DEFAULT_NIGHT_START, night_end=DEFAULT_NIGHT_END, max_days=MAX_DAYS_AHEAD_DEFAULT):
-    search_date = requested_date
-    for offset in range(max_days):
-        occ = get_tasks_occupied_for_date(all_tasks, search_date, ignore_task_id=ignore_task_id) + get_class_occupied_for_date(nim, search_date)
-        merged = merge_intervals(occ)
-        if not merged:
-            if night_start + duration_minutes <= night_end:
-                return (search_date, minutes_to_hm(night_start), minutes_to_hm(night_start + duration_minutes))
-        else:
-            if night_start + duration_minutes <= merged[0][0]:
-                return (search_date, minutes_to_hm(night_start), minutes_to_hm(night_start + duration_minutes))
-            for i in range(len(merged)-1):
-                gap_start = max(merged[i][1], night_start)
-                gap_end = min(merged[i+1][0], night_end)
-                if gap_start + duration_minutes <= gap_end:
-                    return (search_date, minutes_to_hm(gap_start), minutes_to_hm(gap_start + duration_minutes))
-            last_end = max(merged[-1][1], night_start)
-            if last_end + duration_minutes <= night_end:
-                return (search_date, minutes_to_hm(last_end), minutes_to_hm(last_end + duration_minutes))
-        search_date = search_date + timedelta(days=1)
-    return None
-
-# -------------------------
-# Priority & duration
-# -------------------------
-def hitung_waktu_belajar(kesulitan):
-    if kesulitan == 1: return 30
-    if kesulitan == 2: return 60
-    if kesulitan == 3: return 90
-    return 120
-
-def hitung_bobot_prioritas(prioritas, kesulitan):
-    return prioritas + kesulitan
-
-# -------------------------
-# ID gen
-# -------------------------
-def gen_id():
-    return str(uuid.uuid4())[:8]
+        failed = [t.exception() for t in tickets if t.exception() is not None]
+        if failed:
+            queued = {it["id"] for it in st.session_state.queue}
+            st.session_state.queue.extend(it for it in taken if it["id"] not in queued)
+            st.error(f"Perubahan sebelumnya tidak tersimpan ({failed[0]})."
+                     + (f" {len(taken)} item dikembalikan ke antrean." if taken else " Coba lagi."))
+    st.session_state.pending_writes = still
+
+def show_import_errors(errors, limit=500):
+    if errors:
+        st.warning(f"{len(errors)} baris ditolak.")
+        st.dataframe(pd.DataFrame(errors[:limit]))
+
+@st.fragment(run_every="60s")
+def reminder_panel(n=3):
+    # only the next n starts go to the browser, each alarm a setTimeout at its start
+    upcoming = get_reminders().next(st.session_state.user_nim or None, n=n)
+    if not upcoming:
+        return
+    st.subheader("Pengingat berikutnya")
+    st.table(pd.DataFrame(upcoming, columns=["date", "start", "end", "mapel", "jenis"]))
+    js = json.dumps([{"mapel": t["mapel"], "at": f"{t['date']}T{t['start']}"} for t in upcoming])
+    st.components.v1.html(f"""
+    <audio id="alarm" src="{ALARM_URL}" preload="auto"></audio>
+    <script>
+    for (const t of {js}) {{
+        const wait = new Date(t.at).getTime() - Date.now();
+        if (wait >= 0 && wait < 2147483647) setTimeout(() => {{
+            document.getElementById("alarm").play().catch(() => {{}});
+            alert("⏰ Waktunya belajar: " + t.mapel);
+        }}, wait);
+    }}
+    </script>
+    """, height=0)
 
 # -------------------------
 # Streamlit UI
@@ -226,13 +205,20 @@ st.title("Study Scheduler")
 
 # session state initialization
 if "queue" not in st.session_state: st.session_state.queue = []
-if "tasks" not in st.session_state: st.session_state.tasks = load_tasks()
 if "user_nim" not in st.session_state: st.session_state.user_nim = ""
 if "user_name" not in st.session_state: st.session_state.user_name = ""
+if "pending_writes" not in st.session_state: st.session_state.pending_writes = []   # (tickets, queue items) per action
+
+check_writes()
+
+if metrics.ENABLED: metrics.count("ui.reruns")
 
 # Sidebar
 st.sidebar.title("Menu")
-menu = st.sidebar.radio("", ["Login", "Input Kegiatan", "Generate Jadwal", "Lihat Jadwal", "Edit / Hapus", "Timer", "Export"])
+pages = ["Login", "Input Kegiatan", "Generate Jadwal", "Lihat Jadwal", "Edit / Hapus", "Ketersediaan", "Timer", "Export"]
+if metrics.ENABLED or "diag" in st.query_params:
+    pages.append("Diagnostik")   # hidden unless STUDY_METRICS=1 or the URL has ?diag
+menu = st.sidebar.radio("", pages)
 
 # --- Login ---
 if menu == "Login":
@@ -254,7 +240,7 @@ elif menu == "Input Kegiatan":
     col1, col2 = st.columns([2,1])
     with col1:
         mapel = st.text_input("Nama tugas / mata pelajaran")
-        jenis = st.selectbox("Jenis", ["tugas","ujian","praktikum","lainnya"])
+        jenis = st.selectbox("Jenis", JENIS)
         prior = st.slider("Prioritas (1 rendah - 4 tinggi)", 1, 4, 2)
         kes = st.slider("Kesulitan (1..4)", 1, 4, 2)
         deadline = st.text_input("Deadline (YYYY-MM-DD) — opsional")
@@ -300,6 +286,68 @@ elif menu == "Input Kegiatan":
                 st.session_state.queue.append(item)
                 st.success(f"Ditambahkan ke queue: {mapel} pada {requested_date.isoformat()} ({dur}m)")
 
+    with st.expander("Import massal (CSV / JSON Lines)"):
+        tt_file = st.file_uploader("Jadwal kuliah: nim, nama, hari, jam (08:00-10:00)", type=["csv", "jsonl", "json"])
+        if tt_file is not None and st.button("Import jadwal kuliah"):
+            users, errors = import_timetables(tt_file)
+            if not users and not errors:
+                st.warning("File tidak berisi baris.")
+            else:
+                st.success(f"Jadwal kuliah {len(users)} mahasiswa disimpan ke {USERS_FILE}.")
+            show_import_errors(errors)
+        q_file = st.file_uploader("Queue: mapel, requested_date (atau hari, minggu_ke, bulan, tahun), "
+                                  "jenis, deadline, prioritas, kesulitan, user_nim", type=["csv", "jsonl", "json"])
+        generate_now = st.checkbox("Langsung generate & simpan (jam 19-23)")
+        if q_file is not None and st.button("Import queue"):
+            items, errors = import_queue(q_file, default_nim=st.session_state.user_nim or None)
+            if not items and not errors:
+                st.warning("File tidak berisi baris.")
+            elif generate_now:
+                with saving(items):
+                    _, placed, unplaced = generate(get_task_store(), items, st.session_state.user_nim or None,
+                                                   night_end=23*60)
+                    st.success(f"{len(placed)} tugas terjadwal, {len(unplaced)} tanpa slot dalam {MAX_DAYS_AHEAD_DEFAULT} hari.")
+            else:
+                st.session_state.queue.extend(items)
+                st.success(f"{len(items)} item ditambahkan ke queue.")
+            show_import_errors(errors)
+
+    with st.expander("Jadwal rutin mingguan"):
+        # one rule, shown as a task on every matching week (studytracker/recurring.py)
+        col1, col2 = st.columns(2)
+        r_mapel = col1.text_input("Nama kegiatan rutin", key="rule_mapel")
+        r_jenis = col1.selectbox("Jenis", JENIS, key="rule_jenis")
+        r_start = col1.text_input("Jam mulai (HH:MM)", value="19:00", key="rule_start")
+        r_dur = col1.number_input("Durasi (menit)", min_value=15, max_value=600, value=60, step=15, key="rule_dur")
+        r_hari = col2.selectbox("Hari", list(WEEKDAY_MAP.keys()), key="rule_hari")
+        r_minggu = col2.number_input("Mulai minggu ke", min_value=1, max_value=5, value=1, key="rule_minggu")
+        r_bulan = col2.number_input("Bulan (1-12)", min_value=1, max_value=12, value=dt.now().month, key="rule_bulan")
+        r_tahun = col2.number_input("Tahun", min_value=2023, max_value=2100, value=dt.now().year, key="rule_tahun")
+        r_weeks = col1.number_input("Jumlah minggu (0 = tanpa batas)", min_value=0, max_value=104, value=0, key="rule_weeks")
+        r_every = col2.selectbox("Setiap", [1, 2], format_func=lambda n: f"{n} minggu", key="rule_every")
+        if st.button("Simpan jadwal rutin"):
+            first = convert_weekday_to_date(r_hari, r_minggu, r_bulan, r_tahun)
+            if not r_mapel or not first:
+                st.warning("Isi nama kegiatan dan minggu/bulan yang valid.")
+            else:
+                try:
+                    last = first + timedelta(weeks=(r_weeks - 1) * r_every) if r_weeks else None
+                    rule = make_rule(r_mapel, r_jenis, r_hari, r_start, int(r_dur), first, last,
+                                     st.session_state.user_nim or None, r_every)
+                    get_task_store().add_rule(rule)
+                    st.success(f"Jadwal rutin disimpan: {r_mapel} tiap {r_hari} {rule['start']}-{rule['end']} "
+                               f"mulai {rule['date_from']}.")
+                except Exception as e:
+                    st.error(f"Gagal: {e}")
+        rules = get_task_store().list_rules(st.session_state.user_nim or None)
+        if rules:
+            st.dataframe(pd.DataFrame(rules, columns=["id", "mapel", "hari", "start", "end", "date_from", "date_to",
+                                                      "every_weeks"]))
+            rule_id = st.text_input("ID jadwal rutin untuk dihapus (semua pertemuannya)", key="rule_del")
+            if st.button("Hapus jadwal rutin") and rule_id.strip():
+                get_task_store().delete_rule(rule_id.strip())
+                st.success("Jadwal rutin dihapus.")
+
     st.subheader("Queue (sementara)")
     if st.session_state.queue:
         dfq = pd.DataFrame(st.session_state.queue)
@@ -321,116 +369,80 @@ elif menu == "Generate Jadwal":
         night_start_h = st.number_input("Jam mulai malam (jam 24h)", min_value=0, max_value=24, value=19)
         night_end_h = st.number_input("Jam akhir malam (jam 24h)", min_value=1, max_value=24, value=23)
         max_days = st.number_input("Maks hari pencarian slot (hari)", min_value=7, max_value=365, value=MAX_DAYS_AHEAD_DEFAULT)
+        engine = st.radio("Metode", ["greedy", "deadline"], horizontal=True,
+                          format_func={"greedy": "Cepat (slot pertama)", "deadline": "Kejar deadline"}.get,
+                          help="Kejar deadline menyusun ulang antrean supaya sesedikit mungkin tugas lewat deadline (maks ~1 detik).")
         if st.button("Generate & Simpan"):
-            tasks = load_tasks()
-            def deadline_key(it):
-                if it.get("deadline"):
-                    d = parse_iso_date(it["deadline"])
-                    return d or dt.max.date()
-                return dt.max.date()
-            queue_sorted = sorted(st.session_state.queue, key=lambda x: (-x["bobot"], deadline_key(x)))
-            added = 0
-            for it in queue_sorted:
-                req = parse_iso_date(it["requested_date"])
-                dur = it["duration_minutes"]
-                nim_for_check = it.get("user_nim") or st.session_state.user_nim or None
-                slot = find_slot_for_task(tasks, nim_for_check, req, dur, ignore_task_id=None,
-                                          night_start=night_start_h*60, night_end=night_end_h*60, max_days=max_days)
-                if not slot:
-                    st.warning(f"Tidak menemukan slot untuk {it['mapel']} dalam {max_days} hari.")
-                    continue
-                assigned_date, start, end = slot
-                newtask = {
-                    "id": it["id"],
-                    "mapel": it["mapel"],
-                    "jenis": it["jenis"],
-                    "date": assigned_date.isoformat(),
-                    "start": start,
-                    "end": end,
-                    "duration_minutes": dur,
-                    "user_nim": nim_for_check,
-                    "created_at": dt.now().isoformat()
-                }
-                tasks.append(newtask)
-                added += 1
-                st.success(f"Terjadwal: {newtask['mapel']} pada {newtask['date']} {newtask['start']}-{newtask['end']}")
-            save_tasks(tasks)
-            st.session_state.queue = []
-            st.info(f"Selesai. {added} tugas tersimpan ke {DATA_FILE}.")
+            with saving():
+                queue_sorted, new_tasks, unplaced = generate(get_task_store(), st.session_state.queue,
+                                                             st.session_state.user_nim or None, night_start=night_start_h*60,
+                                                             night_end=night_end_h*60, max_days=max_days, engine=engine)
+                placed_by_id = {t["id"]: t for t in new_tasks}
+                for it in queue_sorted:
+                    newtask = placed_by_id.get(it["id"])
+                    if not newtask:
+                        st.warning(f"Tidak menemukan slot untuk {it['mapel']} dalam {max_days} hari.")
+                        continue
+                    late = " (lewat deadline)" if it.get("deadline") and newtask["date"] > it["deadline"] else ""
+                    st.success(f"Terjadwal: {newtask['mapel']} pada {newtask['date']} {newtask['start']}-{newtask['end']}{late}")
+                quality = schedule_quality(queue_sorted, new_tasks, unplaced)
+                st.session_state.queue = []
+                st.info(f"Selesai. {len(new_tasks)} tugas tersimpan ke {DATA_FILE}. "
+                        f"Lewat deadline: {quality['deadline_misses']}, keterlambatan berbobot: {quality['weighted_lateness']} hari.")
+
 
 # --- Lihat Jadwal ---
 elif menu == "Lihat Jadwal":
     st.header("Lihat Jadwal")
-    tasks = load_tasks()
-    if not tasks:
+    version = get_task_store().version()
+    filters = task_filters("view")
+    st.subheader("Tabel tugas")
+    rows = task_table(version, filters, "view")
+    if not rows:
         st.info("Belum ada tugas tersimpan.")
     else:
-        df = pd.DataFrame(tasks)
-        df = df.sort_values(["date","start"])
-        st.subheader("Tabel tugas")
-        st.dataframe(df[["id","mapel","date","start","end","duration_minutes","user_nim"]])
-
         try:
-            import plotly.express as px
-            df_plot = df.copy()
-            df_plot["start_dt"] = pd.to_datetime(df_plot["date"] + " " + df_plot["start"])
-            df_plot["end_dt"] = pd.to_datetime(df_plot["date"] + " " + df_plot["end"])
-            fig = px.timeline(df_plot, x_start="start_dt", x_end="end_dt", y="mapel", color="user_nim", title="Timeline Jadwal")
-            fig.update_yaxes(autorange="reversed")
-            st.plotly_chart(fig, use_container_width=True)
+            task_timeline(version, filters, rows)
         except Exception as e:
             st.write("Plotly error:", e)
 
-    # alarm jadwal 
-    if st.session_state.tasks:
-        js_tasks = json.dumps(st.session_state.tasks)
-
-        alarm_script = f"""
-        <script>
-        const tasks = {js_tasks};
-
-        function checkSchedule() {{
-            const now = new Date();
-            const nowStr = now.toTimeString().slice(0,5); // "HH:MM"
-
-            for (let t of tasks) {{
-                if (t.time === nowStr) {{
-                    alert("⏰ Waktunya belajar: " + mapel);
-            }}
-        }}
-    }}
-
-    // cek setiap 30 detik
-    setInterval(checkSchedule, 30000);
-    </script>
-    """
-
-    # st.components.v1.html(alarm_script, height=0)
+    reminder_panel()
 
 # --- Edit / Hapus ---
 elif menu == "Edit / Hapus":
     st.header("Edit / Hapus Tugas")
-    tasks = load_tasks()
-    if not tasks:
+    store = get_task_store()
+    version = store.version()
+    filters = task_filters("edit")
+    if not task_table(version, filters, "edit"):
         st.info("Belum ada tugas.")
     else:
-        df = pd.DataFrame(tasks).sort_values(["date","start"])
-        st.dataframe(df[["id","mapel","date","start","end","duration_minutes","user_nim"]])
+        col1, col2 = st.columns(2)
+        fill_queue = col1.checkbox("Isi slot kosong dari antrean", value=bool(st.session_state.queue),
+                                   disabled=not st.session_state.queue)
+        pull_later = col2.checkbox("Majukan tugas berikutnya ke slot kosong")
+        replan_opts = {"queue": st.session_state.queue if fill_queue else (), "pull_later": pull_later,
+                       "default_nim": st.session_state.user_nim or None}
+
         st.markdown("### Hapus tugas")
         del_id = st.text_input("ID tugas untuk dihapus")
         if st.button("Hapus tugas"):
             if not del_id:
                 st.warning("Isi ID.")
             else:
-                new_tasks = [t for t in tasks if t.get("id") != del_id]
-                save_tasks(new_tasks)
-                st.success("Tugas dihapus.")
+                with saving():
+                    diff = replan(store, {"op": "delete", "id": del_id}, **replan_opts)
+                    if diff is None:
+                        st.error("ID tidak ditemukan.")
+                    else:
+                        st.success("Tugas dihapus.")
+                        show_replan(diff)
 
         st.markdown("---")
-        st.markdown("### Reassign tugas (hapus dulu lalu cari slot tanpa tugas lama)")
+        st.markdown("### Reassign tugas (cari slot baru tanpa tugas lama)")
         edit_id = st.text_input("ID tugas untuk reassign")
         if edit_id:
-            found = next((t for t in tasks if t.get("id")==edit_id), None)
+            found = store.get(edit_id)
             if not found:
                 st.error("ID tidak ditemukan.")
             else:
@@ -454,20 +466,95 @@ elif menu == "Edit / Hapus":
                         if not new_date:
                             st.error("Tanggal invalid.")
                         else:
-                            tasks_without_old = [t for t in tasks if t.get("id") != edit_id]
-                            dur = found.get("duration_minutes", 60)
-                            nim_for_check = found.get("user_nim") or st.session_state.user_nim or None
-                            slot = find_slot_for_task(tasks_without_old, nim_for_check, new_date, dur, ignore_task_id=None)
-                            if not slot:
-                                st.error("Tidak menemukan slot dalam batas pencarian.")
-                            else:
-                                assigned_date, start, end = slot
-                                found["date"] = assigned_date.isoformat()
-                                found["start"] = start
-                                found["end"] = end
-                                updated = tasks_without_old + [found]
-                                save_tasks(updated)
-                                st.success(f"Berhasil reassign: {found['mapel']} -> {found['date']} {found['start']}-{found['end']}")
+                            with saving():
+                                diff = replan(store, {"op": "move", "id": edit_id, "date": new_date}, **replan_opts)
+                                if diff is None:
+                                    st.error("ID tidak ditemukan.")
+                                elif diff["unplaced"]:
+                                    st.error("Tidak menemukan slot dalam batas pencarian.")
+                                else:
+                                    moved = diff["updated"][0]
+                                    st.success(f"Berhasil reassign: {moved['mapel']} -> {moved['date']} {moved['start']}-{moved['end']}")
+                                    show_replan(diff)
+
+        st.markdown("---")
+        st.markdown("### Ubah durasi")
+        col1, col2 = st.columns(2)
+        resize_id = col1.text_input("ID tugas untuk diubah durasinya")
+        new_dur = col2.number_input("Durasi baru (menit)", min_value=15, max_value=600, value=60, step=15)
+        if st.button("Ubah durasi"):
+            with saving():
+                diff = replan(store, {"op": "resize", "id": resize_id, "duration_minutes": int(new_dur)}, **replan_opts) \
+                    if resize_id else None
+                if diff is None:
+                    st.error("ID tidak ditemukan.")
+                elif diff["unplaced"]:
+                    st.error("Tidak menemukan slot untuk durasi baru dalam batas pencarian.")
+                else:
+                    st.success("Durasi diubah.")
+                    show_replan(diff)
+
+# --- Ketersediaan ---
+elif menu == "Ketersediaan":
+    st.header("Ketersediaan Waktu Malam")
+    col1, col2, col3 = st.columns(3)
+    mine = col1.radio("Lingkup", [True, False], format_func={True: "Saya", False: "Semua mahasiswa"}.get,
+                      index=0 if st.session_state.user_nim else 1, disabled=not st.session_state.user_nim)
+    date_from = col2.date_input("Mulai", value=date.today(), key="av_from")
+    weeks = col3.number_input("Jumlah minggu", min_value=1, max_value=AVAILABILITY_MAX_DAYS // 7, value=4)
+    col1, col2 = st.columns(2)
+    night_start_h = col1.number_input("Jam mulai malam", min_value=0, max_value=23, value=19, key="av_ns")
+    night_end_h = col2.number_input("Jam akhir malam", min_value=1, max_value=24, value=24, key="av_ne")
+    if night_end_h <= night_start_h:
+        st.warning("Jam akhir harus setelah jam mulai.")
+    else:
+        import plotly.express as px
+        av = cached_availability(get_task_store().version(), roster_revision(),
+                                 st.session_state.user_nim if mine else None, date_from,
+                                 date_from + timedelta(days=weeks * 7 - 1), night_start_h * 60, night_end_h * 60)
+        daily, weekly = av["daily"], av["weekly"]
+        if daily.empty:
+            st.info("Belum ada mahasiswa.")
+        elif mine:
+            fig = px.bar(daily, x="date", y=["busy_minutes", "free_minutes"], title="Menit sibuk / bebas per hari",
+                         color_discrete_map={"busy_minutes": "#d62728", "free_minutes": "#2ca02c"})
+            st.plotly_chart(fig)
+            st.subheader("Per minggu")
+            st.dataframe(weekly.drop(columns="user_nim"))
+        else:
+            st.caption(f"{daily['user_nim'].nunique()} mahasiswa, kuliah + tugas tersimpan.")
+            fig = px.imshow(av["hourly"].T, aspect="auto", color_continuous_scale="Greens",
+                            labels={"x": "Tanggal", "y": "Jam", "color": "Mahasiswa bebas"},
+                            title="Mahasiswa yang bebas sepanjang jam itu")
+            st.plotly_chart(fig)
+            per_day = daily.groupby("date")[["busy_minutes", "free_minutes"]].mean().round(1).reset_index()
+            st.plotly_chart(px.bar(per_day, x="date", y=["busy_minutes", "free_minutes"],
+                                   title="Rata-rata menit sibuk / bebas per mahasiswa"))
+            st.subheader("Hari terpadat")
+            st.dataframe(daily.nsmallest(20, "free_minutes"))
+
+        st.subheader("Cari waktu belajar kelompok")
+        members = st.text_area("NIM anggota (pisahkan dengan koma, spasi atau baris baru)",
+                               value=st.session_state.user_nim)
+        col1, col2, col3 = st.columns(3)
+        dur = col1.number_input("Durasi (menit)", min_value=15, max_value=600, value=60, step=15)
+        group_days = col2.number_input("Cari dalam (hari)", min_value=1, max_value=366, value=120)
+        limit = col3.number_input("Jumlah pilihan", min_value=1, max_value=50, value=5)
+        if st.button("Cari slot bersama"):
+            nims = sorted({n for n in members.replace(",", " ").split() if n})
+            unknown = [n for n in nims if n not in DB]
+            if not nims:
+                st.warning("Isi minimal satu NIM.")
+            else:
+                if unknown:
+                    st.warning(f"Tanpa jadwal kuliah (hanya tugas yang dicek): {', '.join(unknown)}")
+                records = get_task_store().records(date_from=date_from, date_to=date_from + timedelta(days=group_days - 1))
+                slots = find_group_slots(records, nims, date_from, dur, night_start=night_start_h * 60,
+                                         night_end=night_end_h * 60, max_days=group_days, limit=limit)
+                if not slots:
+                    st.info(f"Tidak ada {dur} menit bersama untuk {len(nims)} orang dalam {group_days} hari.")
+                else:
+                    st.table(pd.DataFrame(slots, columns=["tanggal", "mulai", "selesai", "bebas sampai"]))
 
 # --- Timer (with louder looping alarm + safe JS formatting) ---
 elif menu == "Timer":
@@ -611,12 +698,60 @@ elif menu == "Timer":
 # --- Export ---
 elif menu == "Export":
     st.header("Export / Backup")
-    tasks = load_tasks()
-    if not tasks:
+    store = get_task_store()
+    if not cached_page(store.version(), None, None, None, None, 0, 0)[1]:
         st.info("Tidak ada data.")
     else:
-        df = pd.DataFrame(tasks).sort_values(["date","start"])
-        st.download_button("Download CSV", df.to_csv(index=False), file_name="tasks_export.csv", mime="text/csv")
-        st.download_button("Download JSON", json.dumps(tasks, ensure_ascii=False, indent=2), file_name="tasks_export.json", mime="application/json")
+        only_mine = st.checkbox("Hanya tugas saya", value=False, disabled=not st.session_state.user_nim)
+        by_date = st.checkbox("Filter tanggal")
+        date_from = date_to = None
+        if by_date:
+            col1, col2 = st.columns(2)
+            date_from = col1.date_input("Dari tanggal")
+            date_to = col2.date_input("Sampai tanggal", value=date_from + timedelta(days=30))
+        fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func={"csv": "CSV", "jsonl": "JSON Lines", "json": "JSON"}.get)
+        filters = {"user_nim": st.session_state.user_nim if only_mine else None, "date_from": date_from, "date_to": date_to}
+        file_name, mime = EXPORT_FORMATS[fmt]
+        # built from the store in chunks when the button is clicked, not on every rerun
+        st.download_button("Download", lambda: export_bytes(store, fmt, **filters), file_name=file_name, mime=mime)
+
+# --- Diagnostik ---
+elif menu == "Diagnostik":
+    st.header("Diagnostik")
+    store = get_task_store()
+    col1, col2 = st.columns(2)
+    if col1.toggle("Rekam metrik", value=metrics.ENABLED) != metrics.ENABLED:
+        metrics.enable(not metrics.ENABLED)
+        st.rerun()
+    if col2.button("Reset metrik"):
+        metrics.reset()
+    st.caption("Metrik per proses server, dihitung sejak server jalan atau sejak reset.")
+
+    version = store.version()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Backend", STORAGE_BACKEND)
+    c2.metric("Jumlah tugas", cached_page(version, None, None, None, None, 0, 0)[1])
+    c3.metric("Tulisan tertunda", store.pending() if isinstance(store, WriteBehindStore) else 0)
+    st.caption(f"Versi store: {version}")
+    if getattr(store, "error", None):
+        st.error(f"Gagal menulis ke disk, dicoba ulang: {store.error}")
+
+    snap = metrics.snapshot()
+    if snap["timings"]:
+        st.subheader("Waktu per panggilan")
+        st.dataframe(pd.DataFrame.from_dict(snap["timings"], orient="index").sort_values("total_ms", ascending=False))
+    if snap["values"]:
+        st.subheader("Nilai (hari dari tanggal diminta, ukuran antrean, ...)")
+        st.dataframe(pd.DataFrame.from_dict(snap["values"], orient="index"))
+    if snap["hit_rates"]:
+        st.subheader("Cache hit rate")
+        st.dataframe(pd.Series(snap["hit_rates"], name="hit_rate").to_frame())
+    if snap["counters"]:
+        st.subheader("Counter")
+        st.dataframe(pd.Series(snap["counters"], name="n").to_frame())
+    if not metrics.ENABLED and not snap["timings"] and not snap["counters"]:
+        st.info("Metrik mati. Nyalakan di atas atau jalankan dengan STUDY_METRICS=1.")
+    st.download_button("Download metrik (JSON)", json.dumps(snap, indent=2, default=str),
+                       file_name="metrics.json", mime="application/json")
 
 # ensure session-state tasks in memory sync with file
\ No newline at end of file
@@ -0,0 +1,2 @@
+# Scheduling and storage core of the Study Scheduler, importable without the
+# Streamlit UI (used by streamlit_app.py and benchmarks/).
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from . import metrics
+from .roster import DB, class_week
+from .scheduler import DEFAULT_NIGHT_END, DEFAULT_NIGHT_START
+
+# Busy and free minutes of the night window per student and day, classes and
+# stored tasks together. Every interval is clipped to the window and added to
+# a (student, day, minute) difference array; one cumsum turns that into
+# occupancy, and the per-day, per-week and per-hour numbers are sums over its
+# axes. No per-day Python loops: the cost is one pass over the intervals plus
+# numpy over students x days x window minutes (MAX_DAYS caps the last one).
+
+MAX_DAYS = 92
+
+
+def _grid(shape, u, d, s, e):
+    import numpy as np
+    # +1 at each start, -1 at each end, flat over (student, day, minute + 1)
+    size = shape[0] * shape[1] * (shape[2] + 1)
+    row = (u * shape[1] + d) * (shape[2] + 1)
+    diff = np.bincount(row + s, minlength=size) - np.bincount(row + e, minlength=size)
+    return np.cumsum(diff.reshape(shape[:2] + (shape[2] + 1,)), axis=2)[:, :, :-1] > 0
+
+@metrics.timed("availability")
+def availability(records, nims, date_from, date_to, night_start=DEFAULT_NIGHT_START, night_end=DEFAULT_NIGHT_END,
+                 db=None):
+    # records: store.records() covering the dates; nims: the students to count.
+    # -> {"daily":  DataFrame user_nim, date, class_minutes, task_minutes, busy_minutes, free_minutes,
+    #     "weekly": the same summed per user_nim and week (its Monday), plus days,
+    #     "hourly": DataFrame date x hour: students with no class or task in that hour of the window}
+    import numpy as np
+    import pandas as pd
+    db = DB if db is None else db
+    nims = list(nims)
+    days = (date_to - date_from).days + 1
+    if days > MAX_DAYS:
+        raise ValueError(f"paling banyak {MAX_DAYS} hari, diminta {days}")
+    width = night_end - night_start
+    shape = (len(nims), days, width)
+    first = date_from.toordinal()
+    user_ix = {nim: i for i, nim in enumerate(nims)}
+
+    rows = [(user_ix[r.user_nim], r.day - first, r.start, r.end) for r in records
+            if r.user_nim in user_ix and r.day is not None and r.start is not None and r.end is not None
+            and 0 <= r.day - first < days]
+    t = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    slots = [(user_ix[nim], wd, s, e) for nim in nims for wd, day in enumerate(class_week(nim, db)) for s, e in day]
+    c = pd.DataFrame(slots, columns=["u", "wd", "s", "e"])
+    when = pd.DataFrame({"d": np.arange(days), "wd": (np.arange(days) + date_from.weekday()) % 7})
+    c = c.merge(when, on="wd")[["u", "d", "s", "e"]].to_numpy(dtype=np.int64).reshape(-1, 4)
+
+    grids = []
+    for iv in (c, t):
+        s = np.clip(iv[:, 2] - night_start, 0, width)
+        e = np.clip(iv[:, 3] - night_start, 0, width)
+        keep = e > s
+        grids.append(_grid(shape, iv[keep, 0], iv[keep, 1], s[keep], e[keep]))
+    busy = grids[0] | grids[1]
+
+    dates = pd.to_datetime([date_from + timedelta(days=i) for i in range(days)])
+    daily = pd.DataFrame({
+        "user_nim": np.repeat(np.array(nims, dtype=object), days),
+        "date": np.tile(dates, len(nims)),
+        "class_minutes": grids[0].sum(axis=2).ravel(),
+        "task_minutes": grids[1].sum(axis=2).ravel(),
+        "busy_minutes": busy.sum(axis=2).ravel(),
+    })
+    daily["free_minutes"] = width - daily["busy_minutes"]
+    weekly = (daily.assign(week=daily["date"] - pd.to_timedelta(daily["date"].dt.weekday, unit="D"), days=1)
+              .groupby(["user_nim", "week"], as_index=False)
+              [["class_minutes", "task_minutes", "busy_minutes", "free_minutes", "days"]].sum())
+
+    # hour segments of the window (the first/last may be partial), then students free in all of one
+    cuts = np.unique(np.r_[0, np.arange(-night_start % 60, width, 60)])
+    cuts = cuts[cuts < width]
+    seg_busy = np.add.reduceat(busy, cuts, axis=2) if width > 0 else np.zeros((len(nims), days, 0), dtype=int)
+    hourly = pd.DataFrame((seg_busy == 0).sum(axis=0), index=dates, columns=(night_start + cuts) // 60)
+    if metrics.ENABLED:
+        metrics.observe("availability.cells", busy.size)
+    return {"daily": daily, "weekly": weekly, "hourly": hourly}
@@ -0,0 +1,136 @@
+import argparse, json, sys
+from datetime import date, timedelta
+
+from . import metrics
+from .export import EXPORT_FORMATS, export_to
+from .importer import import_queue, import_timetables, read_queue
+from .optimize import DEFAULT_BUDGET, schedule_quality
+from .roster import load_roster
+from .scheduler import MAX_DAYS_AHEAD_DEFAULT, find_group_slots, generate
+from .storage import DATA_FILE, USERS_FILE, ConflictError, open_task_store
+from .timeutil import parse_iso_date
+
+# python -m studytracker schedule queue.csv [--data tasks.json] [--nim 16725186] [--dry-run]
+# python -m studytracker import queue.csv [same options as schedule]   (checked with pandas)
+# python -m studytracker roster timetables.csv [--users users.json]
+# python -m studytracker export [--format csv|jsonl|json] [--nim ...] [--from YYYY-MM-DD] [--to ...] [--out file]
+# python -m studytracker group 16725186,16725193 --duration 90 [--from YYYY-MM-DD] [--days 120] [--limit 5]
+# --metrics (before the subcommand) prints timings, counters and cache hit rates to stderr.
+# Queue and timetable files are CSV, JSON Lines or a JSON array; see importer.py for the columns.
+
+
+def cmd_schedule(args):
+    load_roster(args.users)
+    queue, errors = (import_queue if args.command == "import" else read_queue)(args.queue)
+    if not queue and not errors:
+        print(f"{args.queue}: no rows", file=sys.stderr)
+        return 1
+    store = open_task_store(args.storage, args.data)
+    try:
+        _, placed, unplaced = generate(store, queue, args.nim, night_start=args.night_start*60,
+                                       night_end=args.night_end*60, max_days=args.max_days, save=not args.dry_run,
+                                       workers=args.workers or None, engine=args.engine, budget=args.budget)
+    except ConflictError as e:
+        print(f"tasks changed while scheduling, nothing was saved; try again ({e})", file=sys.stderr)
+        return 2
+    for t in placed:
+        print(json.dumps(t, ensure_ascii=False))
+    summary = {"placed": len(placed), "unplaced": [it["id"] for it in unplaced], "invalid": errors,
+               "saved": not args.dry_run, "quality": schedule_quality(queue, placed, unplaced)}
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    return 1 if errors or unplaced else 0
+
+def iso_date(s):
+    d = parse_iso_date(s)
+    if d is None:
+        raise argparse.ArgumentTypeError(f"bukan YYYY-MM-DD: {s!r}")
+    return d
+
+def cmd_roster(args):
+    users, errors = import_timetables(args.timetables, path=args.users)
+    if not users and not errors:
+        print(f"{args.timetables}: no rows", file=sys.stderr)
+        return 1
+    print(json.dumps({"imported": len(users), "invalid": errors}, ensure_ascii=False), file=sys.stderr)
+    return 1 if errors else 0
+
+def cmd_export(args):
+    store = open_task_store(args.storage, args.data)
+    filters = {"user_nim": args.nim, "date_from": args.date_from, "date_to": args.date_to, "chunk_size": args.chunk_size}
+    if args.out in (None, "-"):
+        export_to(sys.stdout, store, args.format, **filters)
+    else:
+        with open(args.out, "w", encoding="utf-8", newline="") as f:
+            export_to(f, store, args.format, **filters)
+    return 0
+
+def cmd_group(args):
+    load_roster(args.users)
+    nims = sorted({n for n in args.nims.replace(",", " ").split() if n})
+    store = open_task_store(args.storage, args.data)
+    records = store.records(date_from=args.date_from, date_to=args.date_from + timedelta(days=args.days - 1))
+    slots = find_group_slots(records, nims, args.date_from, args.duration, night_start=args.night_start*60,
+                             night_end=args.night_end*60, max_days=args.days, limit=args.limit)
+    for d, start, end, free_until in slots:
+        print(json.dumps({"date": d.isoformat(), "start": start, "end": end, "free_until": free_until}))
+    return 0 if slots else 1
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="studytracker", description="Study Scheduler without the Streamlit UI.")
+    ap.add_argument("--metrics", action="store_true", help="print timings and counters to stderr when done")
+    sub = ap.add_subparsers(dest="command", required=True)
+    for command, about in (("schedule", "place a queue file into the task store in one batch"),
+                           ("import", "schedule, reading the queue file with pandas (large files)")):
+        sp = sub.add_parser(command, help=about)
+        sp.add_argument("queue", help="queue items (.csv, .jsonl or .json)")
+        sp.add_argument("--data", default=DATA_FILE, help="tasks file (default: %(default)s)")
+        sp.add_argument("--storage", choices=["json", "log", "sqlite"], help="backend (default: $STUDY_STORAGE or json)")
+        sp.add_argument("--users", default=USERS_FILE, help="imported timetables (default: %(default)s)")
+        sp.add_argument("--nim", help="user_nim for items that have none")
+        sp.add_argument("--night-start", type=int, default=19, help="hour (default: %(default)s)")
+        sp.add_argument("--night-end", type=int, default=23, help="hour (default: %(default)s)")
+        sp.add_argument("--max-days", type=int, default=MAX_DAYS_AHEAD_DEFAULT)
+        sp.add_argument("--workers", type=int, default=1, help="processes, split by user_nim (0 = every core)")
+        sp.add_argument("--engine", choices=["greedy", "deadline"], default="greedy",
+                        help="greedy: first free slot in Generate order; deadline: fewest deadline misses")
+        sp.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="seconds for --engine deadline (default: %(default)s)")
+        sp.add_argument("--dry-run", action="store_true", help="print placements without saving them")
+        sp.set_defaults(func=cmd_schedule)
+
+    rp = sub.add_parser("roster", help="import class timetables (nim, nama, hari, jam)")
+    rp.add_argument("timetables", help="timetable rows (.csv, .jsonl or .json)")
+    rp.add_argument("--users", default=USERS_FILE, help="roster file (default: %(default)s)")
+    rp.set_defaults(func=cmd_roster)
+
+    ep = sub.add_parser("export", help="stream stored tasks in (date, start) order")
+    ep.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    ep.add_argument("--data", default=DATA_FILE, help="tasks file (default: %(default)s)")
+    ep.add_argument("--storage", choices=["json", "log", "sqlite"], help="backend (default: $STUDY_STORAGE or json)")
+    ep.add_argument("--nim", help="only this user's tasks")
+    ep.add_argument("--from", dest="date_from", type=iso_date, help="first date, YYYY-MM-DD")
+    ep.add_argument("--to", dest="date_to", type=iso_date, help="last date, YYYY-MM-DD")
+    ep.add_argument("--chunk-size", type=int, default=1000)
+    ep.add_argument("--out", help="output file (default: stdout)")
+    ep.set_defaults(func=cmd_export)
+
+    gp = sub.add_parser("group", help="earliest times a whole group is free")
+    gp.add_argument("nims", help="member NIMs, comma or space separated")
+    gp.add_argument("--duration", type=int, required=True, help="minutes")
+    gp.add_argument("--from", dest="date_from", type=iso_date, default=date.today(), help="first date (default: today)")
+    gp.add_argument("--days", type=int, default=MAX_DAYS_AHEAD_DEFAULT)
+    gp.add_argument("--limit", type=int, default=5)
+    gp.add_argument("--night-start", type=int, default=19, help="hour (default: %(default)s)")
+    gp.add_argument("--night-end", type=int, default=24, help="hour (default: %(default)s)")
+    gp.add_argument("--data", default=DATA_FILE, help="tasks file (default: %(default)s)")
+    gp.add_argument("--storage", choices=["json", "log", "sqlite"], help="backend (default: $STUDY_STORAGE or json)")
+    gp.add_argument("--users", default=USERS_FILE, help="imported timetables (default: %(default)s)")
+    gp.set_defaults(func=cmd_group)
+    args = ap.parse_args(argv)
+    if not args.metrics:
+        return args.func(args)
+    metrics.enable()
+    try:
+        return args.func(args)
+    finally:
+        print(json.dumps({"metrics": metrics.snapshot()}, default=str), file=sys.stderr)
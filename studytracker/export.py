@@ -0,0 +1,48 @@
+import csv, io, json
+
+# format -> (download file name, mime type)
+EXPORT_FORMATS = {
+    "csv": ("tasks_export.csv", "text/csv"),
+    "jsonl": ("tasks_export.jsonl", "application/x-ndjson"),
+    "json": ("tasks_export.json", "application/json"),
+}
+EXPORT_FIELDS = ["id", "mapel", "jenis", "date", "start", "end", "duration_minutes", "user_nim", "created_at"]
+
+
+def export_chunks(store, fmt="csv", user_nim=None, date_from=None, date_to=None, chunk_size=1000, jenis=None):
+    # the export as text pieces, one per chunk of tasks in (date, start) order;
+    # nothing but the current chunk is held in memory
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    chunks = store.iter_query(user_nim, date_from, date_to, chunk_size, jenis=jenis)
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, EXPORT_FIELDS, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()   # header only: nothing matched
+    elif fmt == "jsonl":
+        for chunk in chunks:
+            yield "".join(json.dumps(t, ensure_ascii=False, default=str) + "\n" for t in chunk)
+    else:
+        sep = "["
+        for chunk in chunks:
+            yield sep + ",".join(json.dumps(t, ensure_ascii=False, default=str, separators=(",", ":")) for t in chunk)
+            sep = ","
+        yield "[]\n" if sep == "[" else "]\n"
+
+def export_bytes(store, fmt="csv", **filters):
+    # for st.download_button(data=callable): built on click, not on every render
+    return b"".join(piece.encode("utf-8") for piece in export_chunks(store, fmt, **filters))
+
+def export_to(f, store, fmt="csv", **filters):
+    # streams into an open text file; returns characters written
+    n = 0
+    for piece in export_chunks(store, fmt, **filters):
+        n += f.write(piece)
+    return n
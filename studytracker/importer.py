@@ -0,0 +1,240 @@
+import csv, io, json, os
+from datetime import datetime as dt
+
+from .scheduler import JENIS, gen_id, hitung_bobot_prioritas, hitung_waktu_belajar
+from .timeutil import WEEKDAY_MAP, convert_weekday_to_date, parse_iso_date
+
+# Bulk import of timetables and queue items from CSV, JSON Lines or a JSON array.
+# Each file is parsed and checked column by column with pandas (imported on
+# first use); bad rows come back as [{"row": n, "error": ...}] with n counted
+# from 1 over the data rows, and the good rows are imported anyway.
+#
+# timetables: nim, nama, hari, jam ("08:00-10:00") or mulai + selesai, one class per row;
+#             JSON records may instead carry a whole "jadwal_kuliah" dict
+# queue:      mapel plus requested_date (YYYY-MM-DD) or hari + minggu_ke + bulan + tahun;
+#             optional jenis, deadline, prioritas, kesulitan, duration_minutes, user_nim, id
+#
+# read_queue() does the same queue checks row by row with the standard library,
+# for the CLI's `schedule`, which would otherwise spend most of its start-up
+# importing pandas.
+
+HM_PATTERN = r"(?:[01]\d|2[0-3]):[0-5]\d|24:00"
+
+
+def read_frame(src, name=None):
+    # src: path or file-like (e.g. a Streamlit upload); the format comes from the extension
+    import pandas as pd
+    name = name or getattr(src, "name", None) or (src if isinstance(src, str) else "")
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext == ".csv":
+        try:
+            return pd.read_csv(src, dtype=str, keep_default_na=False, skipinitialspace=True)
+        except pd.errors.EmptyDataError:   # not even a header: no rows
+            return pd.DataFrame()
+    if isinstance(src, str):
+        with open(src, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = src.read()
+        text = text.decode("utf-8") if isinstance(text, bytes) else text
+    if text.lstrip().startswith("["):
+        return pd.DataFrame.from_records(json.loads(text))
+    return pd.read_json(io.StringIO(text), lines=True, dtype=False) if text.strip() else pd.DataFrame()
+
+def text_col(df, col, default=""):
+    import pandas as pd
+    if col not in df:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[col].where(df[col].notna(), default).astype(str).str.strip()
+
+def first_errors(index, checks):
+    # checks: [(bool Series of bad rows, message)]; each row keeps its first failing check
+    import pandas as pd
+    reason = pd.Series("", index=index, dtype=object)
+    for bad, msg in checks:
+        reason = reason.mask((reason == "") & bad, msg)
+    return reason
+
+def error_rows(reason):
+    bad = reason[reason != ""]
+    return [{"row": int(i) + 1, "error": msg} for i, msg in bad.items()]
+
+def hm_minutes(s):
+    return s.str.slice(0, 2).astype(int) * 60 + s.str.slice(3, 5).astype(int)
+
+# -------------------------
+# Timetables
+# -------------------------
+def parse_timetables(df):
+    # -> ({nim: {"nama", "jadwal_kuliah"}}, errors)
+    import pandas as pd
+    df = df.reset_index(drop=True)
+    if "jadwal_kuliah" in df:
+        # nested JSON records -> one row per class, keeping the record number for errors
+        rows = [{"_row": i, "nim": r.get("nim"), "nama": r.get("nama"), "hari": hari, "jam": jam}
+                for i, r in enumerate(df.to_dict("records")) if isinstance(r.get("jadwal_kuliah"), dict)
+                for hari, slots in r["jadwal_kuliah"].items() for jam in (slots or [])]
+        flat = pd.DataFrame(rows, columns=["_row", "nim", "nama", "hari", "jam"])
+        src_row = flat["_row"]
+        df = flat.drop(columns="_row")
+    else:
+        src_row = pd.Series(df.index, index=df.index)
+    nim, nama, hari = text_col(df, "nim"), text_col(df, "nama"), text_col(df, "hari").str.capitalize()
+    if "jam" in df:
+        jam = text_col(df, "jam").str.replace(" ", "", regex=False)
+        mulai, selesai = jam.str.partition("-")[0], jam.str.partition("-")[2]
+    else:
+        mulai, selesai = text_col(df, "mulai"), text_col(df, "selesai")
+    ok_hm = mulai.str.fullmatch(HM_PATTERN) & selesai.str.fullmatch(HM_PATTERN)
+    start = hm_minutes(mulai.where(ok_hm, "00:00"))
+    end = hm_minutes(selesai.where(ok_hm, "00:00"))
+    reason = first_errors(df.index, [
+        (nim == "", "nim kosong"),
+        (~hari.isin(list(WEEKDAY_MAP)), "hari tidak dikenal"),
+        (~ok_hm, "jam bukan HH:MM-HH:MM"),
+        (start >= end, "jam mulai tidak sebelum jam selesai"),
+    ])
+    failed = pd.Series(reason.values, index=src_row.values)
+    failed = failed[failed != ""]
+    errors = error_rows(failed[~failed.index.duplicated()])   # first bad class of each source row
+
+    good = pd.DataFrame({"nim": nim, "nama": nama, "hari": hari, "start": start,
+                         "jam": mulai + "-" + selesai})[(reason == "").values]
+    good = good.drop_duplicates(["nim", "hari", "jam"]).sort_values(["nim", "hari", "start"])
+    users = {}
+    for n, nm, h, jam in zip(*(good[c].tolist() for c in ("nim", "nama", "hari", "jam"))):
+        u = users.setdefault(n, {"nama": "", "jadwal_kuliah": {}})
+        u["nama"] = u["nama"] or nm
+        u["jadwal_kuliah"].setdefault(h, []).append(jam)
+    return users, errors
+
+def import_timetables(src, name=None, path=None):
+    # parse, then replace the imported NIMs' timetables in users.json and DB
+    from .roster import save_roster
+    users, errors = parse_timetables(read_frame(src, name))
+    if users:
+        save_roster(users, **({"path": path} if path else {}))
+    return users, errors
+
+# -------------------------
+# Queue items
+# -------------------------
+def parse_queue(df, default_nim=None):
+    # -> (queue items shaped like the "Input Kegiatan" form builds them, errors)
+    import pandas as pd
+    df = df.reset_index(drop=True)
+    mapel, jenis = text_col(df, "mapel"), text_col(df, "jenis").str.lower()
+    jenis = jenis.mask(jenis == "", "tugas")
+    iso = pd.to_datetime(text_col(df, "requested_date"), format="%Y-%m-%d", errors="coerce")
+    # hari + minggu_ke + bulan + tahun, like convert_weekday_to_date
+    wd = text_col(df, "hari").str.capitalize().map(WEEKDAY_MAP)
+    week, month, year = (pd.to_numeric(text_col(df, c), errors="coerce") for c in ("minggu_ke", "bulan", "tahun"))
+    first = pd.to_datetime(pd.DataFrame({"year": year, "month": month, "day": 1}), errors="coerce")
+    by_week = first + pd.to_timedelta((wd - first.dt.dayofweek) % 7 + 7 * (week - 1), unit="D")
+    by_week = by_week.where((week >= 1) & (by_week.dt.month == month))
+    req = iso.fillna(by_week)
+    deadline = text_col(df, "deadline")
+    deadline_ok = (deadline == "") | pd.to_datetime(deadline, format="%Y-%m-%d", errors="coerce").notna()
+    prior = pd.to_numeric(text_col(df, "prioritas").mask(lambda s: s == "", "2"), errors="coerce")
+    kes = pd.to_numeric(text_col(df, "kesulitan").mask(lambda s: s == "", "2"), errors="coerce")
+    dur_text = text_col(df, "duration_minutes")
+    dur = pd.to_numeric(dur_text, errors="coerce")
+    # only a missing duration comes from kesulitan; one that isn't a number is a bad row
+    dur = dur.mask(dur_text == "", kes.map({k: hitung_waktu_belajar(k) for k in range(1, 5)}))
+    reason = first_errors(df.index, [
+        (mapel == "", "mapel kosong"),
+        (req.isna(), "tanggal tidak valid (requested_date YYYY-MM-DD atau hari+minggu_ke+bulan+tahun)"),
+        (~deadline_ok, "deadline bukan YYYY-MM-DD"),
+        (~prior.isin(range(1, 5)), "prioritas harus 1..4"),
+        (~kes.isin(range(1, 5)), "kesulitan harus 1..4"),
+        (~(dur > 0) | (dur % 1 != 0), "duration_minutes harus bilangan bulat positif"),
+        (~jenis.isin(JENIS), "jenis tidak dikenal"),
+    ])
+    ok = reason == ""
+    ids = text_col(df, "id")
+    nims = text_col(df, "user_nim")
+    now = dt.now().isoformat()
+    cols = {
+        "id": [i or gen_id() for i in ids[ok].tolist()],
+        "mapel": mapel[ok].tolist(),
+        "jenis": jenis[ok].tolist(),
+        "requested_date": req[ok].dt.strftime("%Y-%m-%d").tolist(),
+        "deadline": deadline[ok].tolist(),
+        "prioritas": prior[ok].astype(int).tolist(),
+        "kesulitan": kes[ok].astype(int).tolist(),
+        "bobot": hitung_bobot_prioritas(prior[ok], kes[ok]).astype(int).tolist(),
+        "duration_minutes": dur[ok].astype(int).tolist(),
+        "user_nim": [n or default_nim for n in nims[ok].tolist()],
+    }
+    items = [dict(zip(cols, row), created_at=now) for row in zip(*cols.values())]
+    return items, error_rows(reason)
+
+def import_queue(src, name=None, default_nim=None):
+    return parse_queue(read_frame(src, name), default_nim)
+
+# -------------------------
+# Queue items without pandas
+# -------------------------
+def read_rows(src, name=None):
+    # -> list of dicts, as read_frame() but with csv/json
+    name = name or getattr(src, "name", None) or (src if isinstance(src, str) else "")
+    if isinstance(src, str):
+        with open(src, "r", encoding="utf-8-sig", newline="") as f:
+            text = f.read()
+    else:
+        text = src.read()
+        text = text.decode("utf-8-sig") if isinstance(text, bytes) else text
+    if os.path.splitext(str(name))[1].lower() == ".csv":
+        return list(csv.DictReader(io.StringIO(text, newline=""), skipinitialspace=True))
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def number(s):
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+def cell(r, col):
+    v = r.get(col)
+    return "" if v is None else str(v).strip()
+
+def queue_row(r, default_nim=None, now=None):
+    # one row of parse_queue(): (item, None) or (None, the first failing check)
+    mapel, jenis = cell(r, "mapel"), cell(r, "jenis").lower() or "tugas"
+    req = parse_iso_date(cell(r, "requested_date"))
+    if req is None:
+        week, month, year = (number(cell(r, c)) for c in ("minggu_ke", "bulan", "tahun"))
+        if None not in (week, month, year) and all(x % 1 == 0 for x in (week, month, year)):
+            req = convert_weekday_to_date(cell(r, "hari"), int(week), int(month), int(year))
+    deadline = cell(r, "deadline")
+    prior, kes = number(cell(r, "prioritas") or "2"), number(cell(r, "kesulitan") or "2")
+    dur_text = cell(r, "duration_minutes")
+    dur = number(dur_text) if dur_text else hitung_waktu_belajar(kes) if kes in range(1, 5) else None
+    for bad, msg in (
+        (mapel == "", "mapel kosong"),
+        (req is None, "tanggal tidak valid (requested_date YYYY-MM-DD atau hari+minggu_ke+bulan+tahun)"),
+        (deadline != "" and parse_iso_date(deadline) is None, "deadline bukan YYYY-MM-DD"),
+        (prior not in range(1, 5), "prioritas harus 1..4"),
+        (kes not in range(1, 5), "kesulitan harus 1..4"),
+        (dur is None or not dur > 0 or dur % 1 != 0, "duration_minutes harus bilangan bulat positif"),
+        (jenis not in JENIS, "jenis tidak dikenal"),
+    ):
+        if bad:
+            return None, msg
+    return {"id": cell(r, "id") or gen_id(), "mapel": mapel, "jenis": jenis, "requested_date": req.isoformat(),
+            "deadline": deadline, "prioritas": int(prior), "kesulitan": int(kes),
+            "bobot": int(hitung_bobot_prioritas(prior, kes)), "duration_minutes": int(dur),
+            "user_nim": cell(r, "user_nim") or default_nim, "created_at": now or dt.now().isoformat()}, None
+
+def read_queue(src, name=None, default_nim=None):
+    # import_queue() without pandas
+    items, errors, now = [], [], dt.now().isoformat()
+    for i, r in enumerate(read_rows(src, name)):
+        item, error = queue_row(r if isinstance(r, dict) else {}, default_nim, now)
+        if error:
+            errors.append({"row": i + 1, "error": error})
+        else:
+            items.append(item)
+    return items, errors
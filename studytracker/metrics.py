@@ -0,0 +1,95 @@
+import functools, json, logging, os, threading, time
+
+# Opt-in counters and timings for the scheduler, stores and caches. Off unless
+# STUDY_METRICS=1 or enable() is called; when off every hook is a single flag
+# test. snapshot() returns everything as a plain dict.
+
+ENABLED = os.environ.get("STUDY_METRICS", "") not in ("", "0")
+
+_lock = threading.Lock()
+_timings = {}    # name -> [calls, total seconds, max seconds]
+_values = {}     # name -> [count, total, max] of observe()d values
+_counters = {}   # name -> int
+_gauges = {}     # name -> last value
+log = logging.getLogger("studytracker.metrics")
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _values.clear()
+        _counters.clear()
+        _gauges.clear()
+
+def _add(table, name, value):
+    with _lock:
+        st = table.get(name)
+        if st is None:
+            table[name] = [1, value, value]
+        else:
+            st[0] += 1
+            st[1] += value
+            if value > st[2]:
+                st[2] = value
+
+def observe(name, value):
+    _add(_values, name, value)
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def gauge(name, value):
+    _gauges[name] = value
+
+def hit(cache, was_hit):
+    count(f"{cache}.hits" if was_hit else f"{cache}.misses")
+
+def timed(name):
+    # decorator: call count and wall time under name when enabled
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _add(_timings, name, time.perf_counter() - t0)
+        return inner
+    return wrap
+
+def instrument(prefix, methods):
+    # class decorator: timed(f"{prefix}.{m}") around each of methods the class defines
+    def wrap(cls):
+        for m in methods:
+            if m in cls.__dict__:
+                setattr(cls, m, timed(f"{prefix}.{m}")(cls.__dict__[m]))
+        return cls
+    return wrap
+
+def snapshot():
+    with _lock:
+        raw_timings = sorted((k, list(v)) for k, v in _timings.items())
+        raw_values = sorted((k, list(v)) for k, v in _values.items())
+        counters = dict(_counters)
+    timings = {name: {"calls": n, "total_ms": round(total * 1000, 3), "mean_ms": round(total / n * 1000, 4),
+                      "max_ms": round(peak * 1000, 3)} for name, (n, total, peak) in raw_timings}
+    values = {name: {"count": n, "total": total, "mean": round(total / n, 3), "max": peak}
+              for name, (n, total, peak) in raw_values}
+    hit_rates = {}
+    for name in counters:
+        if name.endswith(".hits") or name.endswith(".misses"):
+            cache = name.rsplit(".", 1)[0]
+            hits, misses = counters.get(cache + ".hits", 0), counters.get(cache + ".misses", 0)
+            hit_rates[cache] = round(hits / (hits + misses), 4) if hits + misses else None
+    return {"enabled": ENABLED, "timings": timings, "values": values, "counters": dict(sorted(counters.items())),
+            "gauges": dict(_gauges), "hit_rates": dict(sorted(hit_rates.items()))}
+
+def log_snapshot(level=logging.INFO):
+    log.log(level, "metrics %s", json.dumps(snapshot(), default=str))
@@ -0,0 +1,204 @@
+import time
+from datetime import date, datetime as dt
+
+from . import metrics
+from .roster import class_week
+from .scheduler import (
+    DEFAULT_NIGHT_END, DEFAULT_NIGHT_START, MAX_DAYS_AHEAD_DEFAULT, deadline_key, fit_in_gaps, free_gaps,
+)
+from .timeutil import merge_intervals, minutes_to_hm, parse_iso_date
+
+# Deadline-aware alternative to schedule_batch(). Cost of an item = bobot x days
+# past its deadline; an unplaced item costs more than any placement could. Two
+# starting plans are built with the same first-fit-per-day rule the greedy
+# engine uses, one in Generate order (exactly what schedule_batch places) and
+# one in deadline order (EDF), and the cheaper one is improved until the time
+# budget runs out: late or unplaced items move to an earlier day, bumping at
+# most one task of that day to its own earliest free slot when that lowers the
+# total. The result is never worse than greedy and is usually far better when
+# deadlines are tight.
+
+DEFAULT_BUDGET = 1.0   # seconds of improvement after the starting plans
+
+
+def _subtract(gaps, taken):
+    # free gaps minus the (sorted) intervals placed in them
+    out = []
+    for gs, ge in gaps:
+        for s, e in taken:
+            if e <= gs or s >= ge:
+                continue
+            if s > gs:
+                out.append([gs, s])
+            gs = max(gs, e)
+            if gs >= ge:
+                break
+        if gs < ge:
+            out.append([gs, ge])
+    return out
+
+@metrics.timed("schedule_deadline")
+def schedule_deadline(index, queue, default_nim=None, night_start=DEFAULT_NIGHT_START, night_end=DEFAULT_NIGHT_END,
+                      max_days=MAX_DAYS_AHEAD_DEFAULT, db=None, budget=DEFAULT_BUDGET):
+    # same inputs and result shape as schedule_batch(), placed tasks in queue order
+    stop_at = time.perf_counter() + budget
+    items = []
+    for it in queue:
+        dl = parse_iso_date(it["deadline"]) if it.get("deadline") else None
+        items.append((it.get("user_nim") or default_nim or None, parse_iso_date(it["requested_date"]).toordinal(),
+                      dl.toordinal() if dl else None, it["duration_minutes"], max(it.get("bobot") or 1, 1)))
+    base = {}   # (nim, ordinal) -> (first busy minute or None, free gaps) of stored tasks + classes
+    occ = {}    # (nim, ordinal) -> [(start, end, item)] placed by this run
+
+    def day_base(key):
+        b = base.get(key)
+        if b is None:
+            nim, o = key
+            d = date.fromordinal(o)
+            merged = merge_intervals(index.busy_for_user(nim, d) + list(class_week(nim, db)[d.weekday()]))
+            b = base[key] = (merged[0][0] if merged else None, free_gaps(merged, night_start, night_end))
+        return b
+
+    def fit(key, dur):
+        first_busy, gaps = day_base(key)
+        taken = sorted((s, e) for s, e, _ in occ.get(key, ()))
+        if taken:
+            first_busy = taken[0][0] if first_busy is None else min(first_busy, taken[0][0])
+        return fit_in_gaps(first_busy, _subtract(gaps, taken) if taken else gaps, dur, night_start, night_end)
+
+    def cost(i, o):
+        nim, req, dl, dur, w = items[i]
+        if o is None:
+            return w * (max_days + 1 + (max(0, req - dl) if dl is not None else 0))
+        return w * max(0, o - dl) if dl is not None else 0
+
+    def place(i, o, s):
+        pos[i] = (o, s)
+        occ.setdefault((items[i][0], o), []).append((s, s + items[i][3], i))
+
+    def unplace(i):
+        o, s = pos[i]
+        key = (items[i][0], o)
+        occ[key] = [x for x in occ[key] if x[2] != i]
+        pos[i] = None
+
+    def earliest(i):
+        nim, req, dl, dur, w = items[i]
+        for o in range(req, req + max_days):
+            s = fit((nim, o), dur)
+            if s is not None:
+                return o, s
+        return None
+
+    # starting plans: Generate order and deadline order, keep the cheaper one
+    orders = [sorted(range(len(items)), key=lambda i: (-queue[i]["bobot"], deadline_key(queue[i]))),
+              sorted(range(len(items)), key=lambda i: (items[i][2] if items[i][2] is not None else float("inf"),
+                                                        -items[i][4], items[i][1]))]
+    best = None
+    for order in orders:
+        occ.clear()
+        pos = [None] * len(items)
+        for i in order:
+            spot = earliest(i)
+            if spot:
+                place(i, *spot)
+        total = sum(cost(i, p[0] if p else None) for i, p in enumerate(pos))
+        if best is None or total < best[0]:
+            best = (total, list(pos))
+    occ.clear()
+    pos = [None] * len(items)
+    for i, p in enumerate(best[1]):
+        if p:
+            place(i, *p)
+
+    def try_day(i, o):
+        # i onto day o (earlier than now), directly or by bumping one task of
+        # that day to its own earliest slot; kept only when the total drops
+        old = pos[i]
+        if old:
+            unplace(i)
+        key = (items[i][0], o)
+        s = fit(key, items[i][3])
+        if s is not None:
+            place(i, o, s)   # an earlier day is always cheaper for a late/unplaced item
+            return True
+        before = cost(i, old[0] if old else None)
+        for j in sorted({x[2] for x in occ.get(key, ())}, key=lambda j: items[j][2] or float("inf"), reverse=True):
+            j_old = pos[j]
+            unplace(j)
+            s = fit(key, items[i][3])
+            if s is not None:
+                place(i, o, s)
+                spot = earliest(j)
+                if spot:
+                    place(j, *spot)
+                if cost(i, o) + cost(j, spot[0] if spot else None) < before + cost(j, j_old[0]):
+                    return True
+                if spot:
+                    unplace(j)
+                unplace(i)
+            place(j, *j_old)
+        if old:
+            place(i, *old)
+        return False
+
+    # improvement: earlier days for late and unplaced items, worst first
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < stop_at:
+        improved = False
+        late = [i for i in range(len(items)) if cost(i, pos[i][0] if pos[i] else None) > 0]
+        late.sort(key=lambda i: -cost(i, pos[i][0] if pos[i] else None))
+        for i in late:
+            last = pos[i][0] - 1 if pos[i] else items[i][1] + max_days - 1
+            for o in range(items[i][1], last + 1):
+                if time.perf_counter() >= stop_at:
+                    break
+                if try_day(i, o):
+                    moves += 1
+                    improved = True
+                    break
+    if metrics.ENABLED:
+        metrics.count("schedule_deadline.moves", moves)
+
+    placed, unplaced = [], []
+    now = dt.now().isoformat()
+    for i, it in enumerate(queue):
+        if pos[i] is None:
+            unplaced.append(it)
+            continue
+        o, s = pos[i]
+        newtask = {
+            "id": it["id"],
+            "mapel": it["mapel"],
+            "jenis": it["jenis"],
+            "date": date.fromordinal(o).isoformat(),
+            "start": minutes_to_hm(s),
+            "end": minutes_to_hm(s + items[i][3]),
+            "duration_minutes": items[i][3],
+            "user_nim": items[i][0],
+            "created_at": now
+        }
+        index.add(newtask)
+        placed.append(newtask)
+    return placed, unplaced
+
+def schedule_quality(queue, placed, unplaced):
+    # deadline misses and bobot-weighted lateness (days) of one schedule, for comparing engines
+    by_id = {t["id"]: t for t in placed}
+    late = missed = weighted = days_out = 0
+    for it in queue:
+        dl = parse_iso_date(it["deadline"]) if it.get("deadline") else None
+        t = by_id.get(it["id"])
+        if t is None:
+            missed += dl is not None
+            continue
+        d = parse_iso_date(t["date"])
+        days_out += (d - parse_iso_date(it["requested_date"])).days
+        if dl is not None and d > dl:
+            late += 1
+            missed += 1
+            weighted += (it.get("bobot") or 1) * (d - dl).days
+    return {"items": len(queue), "placed": len(placed), "unplaced": len(unplaced), "late": late,
+            "deadline_misses": missed, "weighted_lateness": weighted,
+            "mean_days_out": round(days_out / len(placed), 2) if placed else None}
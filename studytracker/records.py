@@ -0,0 +1,122 @@
+import sys
+from datetime import date
+from functools import lru_cache
+
+from .timeutil import hm_to_minutes, minutes_to_hm, parse_iso_date
+
+# Compact in-memory form of a stored task: the date as an ordinal and start/end
+# as minutes since midnight, parsed once when tasks are read. Stores keep and
+# hand these to the scheduler; to_dict() gives back the JSON shape for saving,
+# exporting and the UI.
+#
+# Values that don't come back from the ints unchanged (a "9:00" start, a bad
+# date), keys missing from the task and keys beyond FIELDS live in extra, so
+# to_dict(from_dict(t)) == t for any task.
+
+FIELDS = ("id", "mapel", "jenis", "date", "start", "end", "duration_minutes", "user_nim", "created_at")
+ABSENT = object()   # extra[key] = ABSENT: the task had no such key
+
+_HM = {minutes_to_hm(m): m for m in range(24 * 60 + 1)}
+_HM_TEXT = list(_HM)
+
+
+@lru_cache(maxsize=8192)
+def _ordinal(s):
+    # -> (ordinal or None, s is the canonical YYYY-MM-DD of it)
+    d = parse_iso_date(s) if isinstance(s, str) else None
+    if d is None:
+        return None, False
+    return d.toordinal(), d.isoformat() == s
+
+@lru_cache(maxsize=8192)
+def _iso(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+def _minutes(s):
+    m = _HM.get(s) if isinstance(s, str) else None
+    if m is not None:
+        return m, True
+    try:
+        return hm_to_minutes(s), False
+    except:
+        return None, False
+
+def _text(v):
+    return sys.intern(v) if type(v) is str else v
+
+
+class TaskRecord:
+    __slots__ = ("id", "mapel", "jenis", "day", "start", "end", "duration_minutes", "user_nim", "created_at", "extra")
+
+    @classmethod
+    def from_dict(cls, t):
+        r = cls.__new__(cls)
+        extra = {}
+        raw = t.get("date", ABSENT)
+        r.day, exact = _ordinal(raw) if type(raw) is str else (None, False)
+        if not exact:
+            extra["date"] = raw
+        raw = t.get("start", ABSENT)
+        r.start, exact = _minutes(raw)
+        if not exact:
+            extra["start"] = raw
+        raw = t.get("end", ABSENT)
+        r.end, exact = _minutes(raw)
+        if not exact:
+            extra["end"] = raw
+        r.id = t.get("id", ABSENT)
+        r.mapel = _text(t.get("mapel", ABSENT))
+        r.jenis = _text(t.get("jenis", ABSENT))
+        r.duration_minutes = t.get("duration_minutes", ABSENT)
+        r.user_nim = _text(t.get("user_nim", ABSENT))
+        r.created_at = t.get("created_at", ABSENT)
+        missing = [k for k in FIELDS if k not in t]
+        if missing or len(t) != len(FIELDS):
+            for k in missing:
+                extra[k] = ABSENT
+            for k, v in t.items():
+                if k not in FIELDS:
+                    extra[k] = v
+        r.extra = extra or None
+        return r
+
+    def to_dict(self):
+        d = {"id": self.id, "mapel": self.mapel, "jenis": self.jenis,
+             "date": _iso(self.day) if self.day is not None else None,
+             "start": _HM_TEXT[self.start] if self.start is not None and 0 <= self.start <= 1440 else None,
+             "end": _HM_TEXT[self.end] if self.end is not None and 0 <= self.end <= 1440 else None,
+             "duration_minutes": self.duration_minutes, "user_nim": self.user_nim, "created_at": self.created_at}
+        if self.extra:
+            for k, v in self.extra.items():
+                if v is ABSENT:
+                    del d[k]
+                else:
+                    d[k] = v
+        return d
+
+    def get(self, key, default=None):
+        # dict-style read of the JSON shape, for code that takes records or dicts
+        if key in ("id", "user_nim", "mapel", "jenis", "duration_minutes", "created_at") and \
+                not (self.extra and key in self.extra):
+            return getattr(self, key)
+        return self.to_dict().get(key, default)
+
+    def __eq__(self, other):
+        return isinstance(other, TaskRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"TaskRecord({self.to_dict()!r})"
+
+    # pickled as the JSON shape (schedule_cohort sends records to worker processes)
+    def __reduce__(self):
+        return TaskRecord.from_dict, (self.to_dict(),)
+
+def to_records(tasks):
+    return [TaskRecord.from_dict(t) for t in tasks]
+
+def owners(user_nim):
+    # a store query's user_nim filter as the owners it keeps, None for no filter:
+    # one NIM, or a tuple of NIMs where None keeps the tasks that have no owner
+    if user_nim is None:
+        return None
+    return frozenset(user_nim) if isinstance(user_nim, tuple) else frozenset((user_nim,))
@@ -0,0 +1,100 @@
+import heapq, uuid
+from datetime import date, datetime as dt, timedelta
+
+from .records import owners
+from .timeutil import WEEKDAY_MAP, hm_to_minutes, minutes_to_hm, parse_iso_date
+
+# Recurring tasks: one rule instead of a stored row per week.
+#   {"id", "mapel", "jenis", "hari": "Rabu", "start": "19:00", "end": "20:30",
+#    "duration_minutes", "user_nim", "date_from": first date, "date_to": last date or None,
+#    "every_weeks": 1, "exceptions": {"YYYY-MM-DD": None (skipped) or a task (changed/moved)},
+#    "created_at"}
+# Occurrences are ordinary task dicts with "rule_id" and id "<rule id>@<date>",
+# the date the rule puts them on (kept when an exception moves one). expand()
+# generates them for the asked window only, so storage and scans grow with
+# rules and exceptions, not with weeks.
+
+SEP = "@"
+OPEN_ENDED_DAYS = 180   # a query without date_to expands rules this far past today
+
+
+def occurrence_id(rule_id, d):
+    return f"{rule_id}{SEP}{d.isoformat()}"
+
+def split_occurrence_id(task_id):
+    # -> (rule id, date) or None for ids that can't be an occurrence
+    if not isinstance(task_id, str) or SEP not in task_id:
+        return None
+    rule_id, _, day = task_id.rpartition(SEP)
+    d = parse_iso_date(day)
+    return (rule_id, d) if rule_id and d else None
+
+def make_rule(mapel, jenis, hari, start, duration_minutes, date_from, date_to=None, user_nim=None, every_weeks=1):
+    # date_from: any date, moved forward to the first `hari` on or after it
+    wd = WEEKDAY_MAP.get(hari.capitalize())
+    if wd is None:
+        raise ValueError(f"hari tidak dikenal: {hari!r}")
+    s = hm_to_minutes(start)
+    if duration_minutes <= 0 or s + duration_minutes > 24 * 60:
+        raise ValueError("durasi harus > 0 dan selesai paling lambat 24:00")
+    first = date_from + timedelta(days=(wd - date_from.weekday()) % 7)
+    return {"id": str(uuid.uuid4())[:8], "mapel": mapel, "jenis": jenis, "hari": hari.capitalize(),
+            "start": minutes_to_hm(s), "end": minutes_to_hm(s + duration_minutes), "duration_minutes": duration_minutes,
+            "user_nim": user_nim, "date_from": first.isoformat(), "date_to": date_to.isoformat() if date_to else None,
+            "every_weeks": max(int(every_weeks or 1), 1), "exceptions": {}, "created_at": dt.now().isoformat()}
+
+def _occurrence(rule, d):
+    return {"id": occurrence_id(rule["id"], d), "mapel": rule["mapel"], "jenis": rule["jenis"], "date": d.isoformat(),
+            "start": rule["start"], "end": rule["end"], "duration_minutes": rule["duration_minutes"],
+            "user_nim": rule.get("user_nim"), "created_at": rule.get("created_at"), "rule_id": rule["id"]}
+
+def _on_rule(rule, d):
+    # d is one of the dates the rule itself puts an occurrence on
+    first = parse_iso_date(rule["date_from"])
+    last = parse_iso_date(rule.get("date_to") or "")
+    step = 7 * rule.get("every_weeks", 1)
+    return first <= d and (last is None or d <= last) and (d - first).days % step == 0
+
+def get_occurrence(rule, d):
+    # occurrence `rule_id@d` as it stands (exception applied), or None
+    if not _on_rule(rule, d):
+        return None
+    ex = rule.get("exceptions") or {}
+    if d.isoformat() in ex:
+        return ex[d.isoformat()]
+    return _occurrence(rule, d)
+
+def task_order(t):
+    # sort key of query() results
+    return (str(t.get("date")), str(t.get("start")))
+
+def _expand_rule(rule, lo, hi):
+    first = parse_iso_date(rule["date_from"])
+    last = parse_iso_date(rule.get("date_to") or "")
+    step = 7 * rule.get("every_weeks", 1)
+    ex = rule.get("exceptions") or {}
+    start = max(first, lo) if lo else first
+    end = min(last, hi) if last else hi
+    d = first + timedelta(days=-(-(start - first).days // step) * step)
+    while d <= end:
+        if d.isoformat() not in ex:
+            yield _occurrence(rule, d)
+        d += timedelta(days=step)
+
+def expand(rules, date_from=None, date_to=None, user_nim=None, jenis=None):
+    # occurrences of rules in [date_from, date_to], in (date, start) order; a
+    # missing date_to means today + OPEN_ENDED_DAYS
+    keep = owners(user_nim)
+    hi = date_to or date.today() + timedelta(days=OPEN_ENDED_DAYS)
+    lo_text, hi_text = date_from.isoformat() if date_from else "", hi.isoformat()
+    streams = []
+    for rule in rules:
+        moved = sorted((t for t in (rule.get("exceptions") or {}).values()
+                        if t and lo_text <= str(t.get("date")) <= hi_text
+                        and (keep is None or t.get("user_nim") in keep)
+                        and (jenis is None or t.get("jenis") == jenis)), key=task_order)
+        if (keep is None or rule.get("user_nim") in keep) and (jenis is None or rule["jenis"] == jenis):
+            streams.append(heapq.merge(_expand_rule(rule, date_from, hi), moved, key=task_order))
+        elif moved:
+            streams.append(moved)
+    return heapq.merge(*streams, key=task_order)
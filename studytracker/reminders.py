@@ -0,0 +1,124 @@
+import heapq, threading
+from datetime import date, datetime as dt
+
+from . import metrics
+from .records import TaskRecord
+from .timeutil import minutes_to_hm
+
+# Upcoming task starts per user, for the schedule alarm. Each user's heap holds
+# (start, task id) of their tasks from today on, start in minutes since day 1.
+# Starts that have passed are popped as time goes by; an edit pushes a new
+# entry and leaves the old one to be skipped when it surfaces, so next() costs
+# O(n log heap) however long the history is.
+#
+# The queue follows the store through store.subscribe(): writes made through
+# the same store object are applied in place. Anything else (another process,
+# a full save) moves the version without a matching call, and each user's heap
+# is then rebuilt from store.records(date_from=today) when next asked for.
+
+REMINDERS_DEFAULT = 3
+
+
+def _at(day, start):
+    return day * 1440 + start
+
+class ReminderQueue:
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._heaps = {}    # nim -> heap of (at, id)
+        self._stale = {}    # nim -> entries in the heap that no longer count
+        self._live = {}     # id -> (nim, at, mapel, jenis, end) of users with a heap
+        self._version = store.version()
+        store.subscribe(self._on_write)
+
+    def _on_write(self, before, after, upserts, deletes):
+        with self._lock:
+            if before != self._version or upserts is None:
+                self._reset()
+            else:
+                for task_id in deletes:
+                    self._drop(task_id)
+                for t in upserts:
+                    self._push(t if isinstance(t, TaskRecord) else TaskRecord.from_dict(t))
+            self._version = after
+
+    def _reset(self):
+        self._heaps.clear()
+        self._stale.clear()
+        self._live.clear()
+
+    def _drop(self, task_id):
+        old = self._live.pop(task_id, None)
+        if old is not None:
+            self._stale[old[0]] += 1
+
+    def _push(self, r, floor=None):
+        nim = r.get("user_nim") or None
+        heap = self._heaps.get(nim)
+        if heap is None or r.day is None or r.start is None:
+            self._drop(r.id)
+            return
+        at = _at(r.day, r.start)
+        if floor is None:
+            now = dt.now()
+            floor = _at(now.toordinal(), now.hour * 60 + now.minute)
+        if at < floor:
+            self._drop(r.id)
+            return
+        entry = (nim, at, r.mapel, r.jenis, r.end)
+        if self._live.get(r.id) == entry:
+            return
+        self._drop(r.id)
+        self._live[r.id] = entry
+        heapq.heappush(heap, (at, r.id))
+        if self._stale[nim] > 64 and self._stale[nim] * 2 > len(heap):
+            self._heaps[nim] = [x for x in heap if self._valid(nim, x)]
+            heapq.heapify(self._heaps[nim])
+            self._stale[nim] = 0
+
+    def _valid(self, nim, item):
+        e = self._live.get(item[1])
+        return e is not None and e[0] == nim and e[1] == item[0]
+
+    def _build(self, nim, today, floor):
+        self._heaps[nim] = []
+        self._stale[nim] = 0
+        for r in self.store.records(user_nim=nim, date_from=today):
+            if (r.get("user_nim") or None) == nim:
+                self._push(r, floor)
+
+    def next(self, nim=None, now=None, n=REMINDERS_DEFAULT):
+        # -> the next n tasks of nim starting at or after now, earliest first;
+        # none without a nim (records() would read every user's tasks)
+        if not nim:
+            return []
+        now = now or dt.now()
+        floor = _at(now.toordinal(), now.hour * 60 + now.minute)
+        version = self.store.version()
+        with self._lock:
+            if version != self._version:
+                self._reset()
+                self._version = version
+            if metrics.ENABLED:
+                metrics.hit("reminders", nim in self._heaps)
+            if nim not in self._heaps:
+                self._build(nim, now.date(), floor)
+            heap = self._heaps[nim]
+            out, keep = [], []
+            while heap and len(out) < n:
+                at, task_id = heapq.heappop(heap)
+                if not self._valid(nim, (at, task_id)) or (keep and keep[-1] == (at, task_id)):
+                    self._stale[nim] = max(0, self._stale[nim] - 1)
+                    continue
+                if at < floor:
+                    del self._live[task_id]
+                    continue
+                keep.append((at, task_id))
+                _, _, mapel, jenis, end = self._live[task_id]
+                out.append({"id": task_id, "mapel": mapel, "jenis": jenis,
+                            "date": date.fromordinal(at // 1440).isoformat(), "start": minutes_to_hm(at % 1440),
+                            "end": minutes_to_hm(end) if end is not None else None, "in_minutes": at - floor})
+            for item in keep:
+                heapq.heappush(heap, item)
+        return out
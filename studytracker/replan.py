@@ -0,0 +1,136 @@
+from datetime import datetime as dt, timedelta
+
+from . import metrics
+from .roster import class_week
+from .scheduler import (
+    DEFAULT_NIGHT_END, DEFAULT_NIGHT_START, MAX_DAYS_AHEAD_DEFAULT, ScheduleIndex, find_slot_for_task, free_gaps,
+    gen_id, sort_queue,
+)
+from .timeutil import hm_to_minutes, merge_intervals, minutes_to_hm, parse_iso_date
+
+# Incremental re-planning after one edit to a stored task:
+#   {"op": "delete", "id": ...}
+#   {"op": "move", "id": ..., "date": date}               first free slot from date on
+#   {"op": "resize", "id": ..., "duration_minutes": n}    same start if it still fits
+# Only the owner's days from the edited task on (max_days of them) are read.
+# The time the edit frees can then be filled: queue items go into it first
+# (Generate order, not before their requested_date), then with pull_later=True
+# the owner's later tasks move up into it one by one, each leaving its old
+# slot free for the ones after it. replan() returns the diff and, with
+# save=True, writes only those tasks in one store.apply_changes().
+# A task stored without a user_nim is planned (and written back) as
+# default_nim's; with neither, replan() raises NoOwnerError.
+
+
+class NoOwnerError(ValueError):
+    # the edited task has no user_nim and no default_nim was given
+    pass
+
+def _slot(index, nim, day, dur, night_start, night_end, max_days):
+    found = find_slot_for_task(None, nim, day, dur, night_start=night_start, night_end=night_end,
+                               max_days=max_days, index=index)
+    return (found[0], hm_to_minutes(found[1])) if found else None
+
+def _fits(index, nim, day, start, dur, night_end):
+    busy = merge_intervals(index.busy_for_user(nim, day) + list(class_week(nim)[day.weekday()]))
+    return start + dur <= night_end and all(start + dur <= s or start >= e for s, e in busy)
+
+def _in_freed(index, nim, freed, dur, floor, night_start, night_end, before=None):
+    # earliest (day, start) inside one of the freed intervals where dur fits, not before floor
+    for day, fs, fe in sorted(freed):
+        if day < floor:
+            continue
+        busy = merge_intervals(index.busy_for_user(nim, day) + list(class_week(nim)[day.weekday()]))
+        for gs, ge in free_gaps(busy, night_start, night_end):
+            s = max(gs, fs)
+            if s + dur <= min(ge, fe):
+                if before is not None and (day, s) >= before:
+                    return None
+                return day, s
+    return None
+
+@metrics.timed("replan")
+def replan(store, change, queue=(), pull_later=False, default_nim=None, night_start=DEFAULT_NIGHT_START,
+           night_end=DEFAULT_NIGHT_END, max_days=MAX_DAYS_AHEAD_DEFAULT, save=True):
+    # -> {"deleted": [ids], "updated": [tasks], "added": [tasks from queue], "unplaced": [...]},
+    #    or None when change["id"] is not stored
+    def plan(version):
+        task = store.get(change["id"])
+        if task is None:
+            return None
+        nim = task.get("user_nim") or default_nim or None
+        if nim is None:
+            raise NoOwnerError(f"task {task['id']!r} has no user_nim and no default_nim was given")
+        task = dict(task, user_nim=nim)
+        day = parse_iso_date(task.get("date"))
+        start, end = hm_to_minutes(task["start"]), hm_to_minutes(task["end"])
+        dur = end - start
+        target = change.get("date") or day
+        lo = min(day, target)
+        hi = max(day, target) + timedelta(days=max_days - 1)
+        window = store.records(user_nim=nim, date_from=lo, date_to=hi)
+        index = ScheduleIndex(window)
+        index.remove(task["id"])
+        diff = {"deleted": [], "updated": [], "added": [], "unplaced": []}
+        freed = [(day, start, end)]
+
+        if change["op"] == "move" or change["op"] == "resize":
+            new_dur = change.get("duration_minutes") or task.get("duration_minutes") or dur
+            if change["op"] == "resize" and _fits(index, nim, day, start, new_dur, night_end):
+                spot = (day, start)
+            else:
+                spot = _slot(index, nim, target, new_dur, night_start, night_end, max_days)
+            if spot is None:
+                diff["unplaced"].append(task)
+                return diff
+            moved = dict(task, date=spot[0].isoformat(), start=minutes_to_hm(spot[1]),
+                         end=minutes_to_hm(spot[1] + new_dur), duration_minutes=new_dur)
+            index.add(moved)
+            diff["updated"].append(moved)
+            if spot == (day, start):
+                freed = [(day, start + new_dur, end)] if start + new_dur < end else []
+        else:
+            diff["deleted"].append(task["id"])
+
+        # queue items that land in the freed time
+        for it in sort_queue(queue) if freed else ():
+            if (it.get("user_nim") or default_nim or None) != nim:
+                continue
+            spot = _in_freed(index, nim, freed, it["duration_minutes"], parse_iso_date(it["requested_date"]),
+                             night_start, night_end)
+            if spot:
+                newtask = {"id": it.get("id") or gen_id(), "mapel": it["mapel"], "jenis": it["jenis"],
+                           "date": spot[0].isoformat(), "start": minutes_to_hm(spot[1]),
+                           "end": minutes_to_hm(spot[1] + it["duration_minutes"]),
+                           "duration_minutes": it["duration_minutes"], "user_nim": nim,
+                           "created_at": dt.now().isoformat()}
+                index.add(newtask)
+                diff["added"].append(newtask)
+
+        # later tasks move up into the freed time, each freeing its old slot in turn
+        if pull_later and freed:
+            first = min(freed)
+            edited = {t["id"] for t in diff["updated"]}
+            later = sorted((r for r in window if r.day is not None
+                            and r.start is not None and r.id not in edited and r.id != task["id"]
+                            and (r.day, r.start) > (first[0].toordinal(), first[1])),
+                           key=lambda r: (r.day, r.start))
+            for r in later:
+                t = r.to_dict()
+                day_r = parse_iso_date(t["date"])
+                index.remove(r.id)
+                spot = _in_freed(index, nim, freed, r.end - r.start, parse_iso_date(t.get("requested_date")) or first[0],
+                                 night_start, night_end, before=(day_r, r.start))
+                if spot:
+                    t.update(date=spot[0].isoformat(), start=minutes_to_hm(spot[1]),
+                             end=minutes_to_hm(spot[1] + r.end - r.start))
+                    diff["updated"].append(t)
+                    freed.append((day_r, r.start, r.end))
+                index.add(t)
+
+        if save:
+            store.apply_changes(diff["updated"] + diff["added"], diff["deleted"], expected_version=version)
+        if metrics.ENABLED:
+            metrics.observe("replan.changed", len(diff["updated"]) + len(diff["added"]) + len(diff["deleted"]))
+        return diff
+    return store.transact(plan)
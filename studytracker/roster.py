@@ -0,0 +1,159 @@
+import json
+
+from . import metrics
+from .storage import USERS_FILE, file_lock, write_json_atomic
+from .timeutil import WEEKDAY_MAP, hm_to_minutes, intervals_mask
+
+
+# -------------------------
+# Demo database (jadwal kuliah)
+# -------------------------
+def buat_database_mahasiswa():
+    return {
+        "16725186": {
+            "nama": "Jean Fide Tjahjamuljo",
+            "jadwal_kuliah": {
+                "Senin": ["08:00-10:00", "13:00-15:00"],
+                "Selasa": ["10:00-12:00"],
+                "Rabu": ["08:00-10:00", "15:00-17:00"],
+                "Kamis": ["13:00-15:00"],
+                "Jumat": ["10:00-12:00"]
+            }
+        },
+        "16725193": {
+            "nama": "Farel Ahmad",
+            "jadwal_kuliah": {
+                "Senin": ["10:00-12:00"],
+                "Selasa": ["08:00-10:00", "13:00-15:00"],
+                "Rabu": ["10:00-12:00"],
+                "Kamis": ["08:00-10:00", "15:00-17:00"],
+                "Jumat": ["13:00-15:00"]
+            }
+        },
+        "16725305": {
+            "nama": "Nindya Cettakirana Bintoro",
+            "jadwal_kuliah": {
+                "Senin": ["08:00-10:00"],
+                "Selasa": ["10:00-12:00", "15:00-17:00"],
+                "Rabu": ["13:00-15:00"],
+                "Kamis": ["08:00-10:00", "13:00-15:00"],
+                "Jumat": ["10:00-12:00"]
+            }
+        },
+        "16725494": {
+            "nama": "Louis Sergio Fredly",
+            "jadwal_kuliah": {
+                "Senin": ["08:00-10:00", "13:00-15:00"],
+                "Selasa": ["10:00-12:00"],
+                "Rabu": ["08:00-10:00", "15:00-17:00"],
+                "Kamis": ["13:00-15:00"],
+                "Jumat": ["10:00-12:00"]
+            }
+        },
+        "16725424": {
+            "nama": "Felicya Ribka Zafeena",
+            "jadwal_kuliah": {
+                "Senin": ["08:00-10:00", "13:00-15:00"],
+                "Selasa": ["10:00-12:00"],
+                "Rabu": ["08:00-10:00", "15:00-17:00"],
+                "Kamis": ["13:00-15:00"],
+                "Jumat": ["10:00-12:00"]
+            }
+        },
+    }
+
+DB = buat_database_mahasiswa()
+
+# -------------------------
+# Imported roster (users.json)
+# -------------------------
+# users.json holds [{"nim", "nama", "jadwal_kuliah"}, ...] on top of the demo
+# entries; load_roster() merges it into DB in place so every importer of DB
+# sees it, and drops the compiled timetables of the NIMs it touched.
+def read_users(path=USERS_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def load_roster(path=USERS_FILE):
+    users = read_users(path)
+    for u in users:
+        DB[u["nim"]] = {"nama": u.get("nama", ""), "jadwal_kuliah": u.get("jadwal_kuliah", {})}
+        invalidate_timetables(u["nim"])
+    return len(users)
+
+def save_roster(users, path=USERS_FILE):
+    # users: {nim: {"nama", "jadwal_kuliah"}}; replaces those NIMs' entries
+    with file_lock(path):
+        merged = {u["nim"]: u for u in read_users(path)}
+        for nim, u in users.items():
+            merged[nim] = {"nim": nim, "nama": u.get("nama") or merged.get(nim, {}).get("nama") or DB.get(nim, {}).get("nama", ""),
+                           "jadwal_kuliah": u["jadwal_kuliah"]}
+        write_json_atomic(path, list(merged.values()), ensure_ascii=False, indent=2)
+    for nim in users:
+        DB[nim] = {"nama": merged[nim]["nama"], "jadwal_kuliah": merged[nim]["jadwal_kuliah"]}
+        invalidate_timetables(nim)
+    return len(users)
+
+# -------------------------
+# Class timetables
+# -------------------------
+def compile_timetable(jadwal):
+    # {"Senin": ["08:00-10:00", ...], ...} -> 7 weekday slots of sorted (start, end) minutes
+    week = [[] for _ in range(7)]
+    for hari, slots in jadwal.items():
+        wd = WEEKDAY_MAP.get(hari)
+        if wd is None:
+            continue
+        for times in slots:
+            try:
+                s,e = times.split("-")
+                week[wd].append((hm_to_minutes(s), hm_to_minutes(e)))
+            except:
+                continue
+    return tuple(tuple(sorted(day)) for day in week)
+
+EMPTY_WEEK = ((),) * 7
+_timetables = {}   # nim -> (jadwal_kuliah object, compiled week, weekday bitmaps)
+_revision = 0      # bumped whenever a timetable may have changed (cache key for views over classes)
+
+def class_week(nim, db=None):
+    # recompiled when DB[nim]["jadwal_kuliah"] is a different object; call
+    # invalidate_timetables() after editing one in place
+    db = DB if db is None else db
+    if not nim or nim not in db:
+        return EMPTY_WEEK
+    return _compiled_timetable(nim, db)[1]
+
+def class_week_masks(nim, db=None):
+    db = DB if db is None else db
+    if not nim or nim not in db:
+        return (0,) * 7
+    return _compiled_timetable(nim, db)[2]
+
+def _compiled_timetable(nim, db):
+    jadwal = db[nim].get("jadwal_kuliah", {})
+    hit = _timetables.get(nim)
+    if metrics.ENABLED:
+        metrics.hit("timetables", hit is not None and hit[0] is jadwal)
+    if hit is None or hit[0] is not jadwal:
+        week = compile_timetable(jadwal)
+        hit = (jadwal, week, tuple(intervals_mask(day) for day in week))
+        _timetables[nim] = hit
+    return hit
+
+def invalidate_timetables(nim=None):
+    global _revision
+    _revision += 1
+    if nim is None:
+        _timetables.clear()
+    else:
+        _timetables.pop(nim, None)
+
+def roster_revision():
+    return _revision
+
+def get_class_occupied_for_date(nim, target_date):
+    return [list(iv) for iv in class_week(nim)[target_date.weekday()]]
@@ -0,0 +1,445 @@
+import heapq, os, uuid
+from datetime import date, datetime as dt, timedelta
+
+from . import metrics
+from .records import TaskRecord
+from .roster import DB, class_week, class_week_masks
+from .timeutil import hm_to_minutes, interval_mask, merge_intervals, minutes_to_hm, parse_iso_date
+
+
+DEFAULT_NIGHT_START = 19 * 60
+DEFAULT_NIGHT_END = 24 * 60
+MAX_DAYS_AHEAD_DEFAULT = 60
+
+
+# -------------------------
+# Scheduling logic
+# -------------------------
+def get_tasks_occupied_for_date(all_tasks, target_date, ignore_task_id=None):
+    occ = []
+    for t in all_tasks:
+        if ignore_task_id and t.get("id") == ignore_task_id:
+            continue
+        try:
+            if parse_iso_date(t.get("date")) == target_date:
+                occ.append([hm_to_minutes(t["start"]), hm_to_minutes(t["end"])])
+        except:
+            continue
+    return occ
+
+class ScheduleIndex:
+    # busy intervals (minutes) per (user_nim, date); build once per store version
+    # and call add()/remove() as tasks are placed or dropped. A calendar only
+    # holds its owner's tasks: other students' tasks never block a slot.
+    def __init__(self, tasks=()):
+        self._items = {}        # (nim, date) -> [(start, end, task_id), ...]
+        self._merged = {}       # (nim, date) -> merged [[start, end], ...]
+        self._keys_by_id = {}   # task_id -> set of (nim, date)
+        self._masks = {}        # (nim, date) -> busy bitmap (bit m = minute m)
+        self._odd = {}          # (nim, date) -> count of empty/inverted intervals (no bitmap)
+        for t in tasks:
+            self.add(t)
+
+    def __len__(self):
+        return sum(len(v) for v in self._items.values())
+
+    def add(self, task):
+        # task: a stored dict or a TaskRecord (already parsed, so no string work here)
+        if type(task) is TaskRecord:
+            if task.day is None or task.start is None or task.end is None:
+                return False
+            d, s, e = date.fromordinal(task.day), task.start, task.end
+        else:
+            try:
+                d = parse_iso_date(task.get("date"))
+                s, e = hm_to_minutes(task["start"]), hm_to_minutes(task["end"])
+            except:
+                return False
+            if d is None:
+                return False
+        nim, tid = task.get("user_nim"), task.get("id")
+        key = (nim, d)
+        self._items.setdefault(key, []).append((s, e, tid))
+        self._keys_by_id.setdefault(tid, set()).add(key)
+        self._merged.pop(key, None)
+        bits = interval_mask(s, e)
+        if bits is None:
+            self._odd[key] = self._odd.get(key, 0) + 1
+        else:
+            self._masks[key] = self._masks.get(key, 0) | bits
+        return True
+
+    def remove(self, task_id):
+        for key in self._keys_by_id.pop(task_id, ()):
+            items, mask = [], 0
+            for it in self._items.get(key, []):
+                bits = interval_mask(it[0], it[1])
+                if it[2] != task_id:
+                    items.append(it)
+                    mask |= bits or 0
+                elif bits is None:
+                    self._odd[key] -= 1
+                    if not self._odd[key]:
+                        del self._odd[key]
+            if items:
+                self._items[key] = items
+                self._masks[key] = mask
+            else:
+                self._items.pop(key, None)
+                self._masks.pop(key, None)
+            self._merged.pop(key, None)
+
+    def users(self):
+        return {nim for nim, d in self._items}
+
+    def busy_for_user(self, nim, target_date, ignore_task_id=None):
+        key = (nim, target_date)
+        if ignore_task_id and key in self._keys_by_id.get(ignore_task_id, ()):
+            return merge_intervals([[s, e] for s, e, tid in self._items[key] if tid != ignore_task_id])
+        merged = self._merged.get(key)
+        if metrics.ENABLED:
+            metrics.hit("index.merged", merged is not None)
+        if merged is None:
+            merged = merge_intervals([[s, e] for s, e, _ in self._items.get(key, ())])
+            self._merged[key] = merged
+        return merged
+
+    def mask_for_user(self, nim, target_date, ignore_task_id=None):
+        # busy bitmap of nim's tasks, or None when the day holds an empty/inverted
+        # interval (those only behave like first_fit_in_day on the merged lists)
+        key = (nim, target_date)
+        if key in self._odd:
+            return None
+        if ignore_task_id and key in self._keys_by_id.get(ignore_task_id, ()):
+            mask = 0
+            for s, e, tid in self._items[key]:
+                if tid != ignore_task_id:
+                    mask |= interval_mask(s, e)
+            return mask
+        return self._masks.get(key, 0)
+
+def first_fit_in_day(merged, duration_minutes, night_start, night_end):
+    # earliest start minute inside the night window, or None
+    if not merged:
+        if night_start + duration_minutes <= night_end:
+            return night_start
+        return None
+    if night_start + duration_minutes <= merged[0][0]:
+        return night_start
+    for i in range(len(merged)-1):
+        gap_start = max(merged[i][1], night_start)
+        gap_end = min(merged[i+1][0], night_end)
+        if gap_start + duration_minutes <= gap_end:
+            return gap_start
+    last_end = max(merged[-1][1], night_start)
+    if last_end + duration_minutes <= night_end:
+        return last_end
+    return None
+
+def first_fit_in_mask(busy, duration_minutes, night_start, night_end):
+    # first_fit_in_day for a busy bitmap (duration_minutes > 0): the lowest bit of
+    # `runs` marks the first minute that starts duration_minutes free minutes in a row
+    if night_start + duration_minutes > night_end:
+        first_busy = (busy & -busy).bit_length() - 1
+        return night_start if busy and night_start + duration_minutes <= first_busy else None
+    runs = ~busy & interval_mask(night_start, night_end)
+    k = 1
+    while k < duration_minutes and runs:
+        step = min(k, duration_minutes - k)
+        runs &= runs >> step
+        k += step
+    if not runs:
+        return None
+    return (runs & -runs).bit_length() - 1
+
+@metrics.timed("find_slot_for_task")
+def find_slot_for_task(all_tasks, nim, requested_date, duration_minutes, ignore_task_id=None,
+                       night_start=DEFAULT_NIGHT_START, night_end=DEFAULT_NIGHT_END, max_days=MAX_DAYS_AHEAD_DEFAULT,
+                       index=None):
+    if index is None:
+        index = ScheduleIndex(all_tasks)
+    week, class_masks = class_week(nim), class_week_masks(nim)
+    search_date = requested_date
+    for offset in range(max_days):
+        busy = index.mask_for_user(nim, search_date, ignore_task_id=ignore_task_id)
+        class_mask = class_masks[search_date.weekday()]
+        if busy is not None and class_mask is not None and duration_minutes > 0:
+            start = first_fit_in_mask(busy | class_mask, duration_minutes, night_start, night_end)
+        else:
+            occ = index.busy_for_user(nim, search_date, ignore_task_id=ignore_task_id) + list(week[search_date.weekday()])
+            start = first_fit_in_day(merge_intervals(occ), duration_minutes, night_start, night_end)
+        if start is not None:
+            if metrics.ENABLED:
+                metrics.count("find_slot_for_task.days_scanned", offset + 1)
+                metrics.observe("find_slot_for_task.days_out", offset)
+            return (search_date, minutes_to_hm(start), minutes_to_hm(start + duration_minutes))
+        search_date = search_date + timedelta(days=1)
+    if metrics.ENABLED:
+        metrics.count("find_slot_for_task.days_scanned", max(max_days, 0))
+        metrics.count("find_slot_for_task.unplaced")
+    return None
+
+def free_gaps(merged, night_start, night_end):
+    # complement of merged busy intervals inside [night_start, night_end]
+    gaps, cur = [], night_start
+    for s, e in merged:
+        if s > cur:
+            gaps.append([cur, min(s, night_end)])
+        cur = max(cur, e)
+        if cur >= night_end:
+            break
+    if cur < night_end:
+        gaps.append([cur, night_end])
+    return [g for g in gaps if g[0] < g[1]]
+
+def fit_in_gaps(first_busy, gaps, duration_minutes, night_start, night_end):
+    # first_fit_in_day() on a day kept as its first busy minute and free_gaps()
+    if night_start + duration_minutes > night_end:
+        # first_fit_in_day only lets this through in front of the first busy interval
+        return night_start if first_busy is not None and night_start + duration_minutes <= first_busy else None
+    for gs, ge in gaps:
+        if gs + duration_minutes <= ge:
+            return gs
+    return None
+
+@metrics.timed("find_group_slots")
+def find_group_slots(all_tasks, nims, requested_date, duration_minutes, night_start=DEFAULT_NIGHT_START,
+                     night_end=DEFAULT_NIGHT_END, max_days=MAX_DAYS_AHEAD_DEFAULT, limit=5, db=None):
+    # earliest times when every nim is free for duration_minutes, from requested_date
+    # on: [(date, start, end, free_until), ...], at most limit, one per free gap.
+    # The group's busy bitmap per day is the OR of everyone's classes (per weekday)
+    # and tasks (one pass over all_tasks), so a day costs a few big-int ops
+    # however large the group. Empty/inverted intervals take no time here.
+    members = set(nims)
+    first = requested_date.toordinal()
+    week = [0] * 7
+    for nim in members:
+        for wd, day in enumerate(class_week(nim, db)):
+            for s, e in day:
+                week[wd] |= interval_mask(s, e) or 0
+    busy_days = {}
+    for t in all_tasks:
+        if t.get("user_nim") not in members:
+            continue
+        if type(t) is TaskRecord:
+            o, s, e = t.day, t.start, t.end
+        else:
+            d = parse_iso_date(t.get("date"))
+            try:
+                o, s, e = d.toordinal(), hm_to_minutes(t["start"]), hm_to_minutes(t["end"])
+            except:
+                continue
+        if o is not None and s is not None and e is not None and 0 <= o - first < max_days:
+            busy_days[o] = busy_days.get(o, 0) | (interval_mask(s, e) or 0)
+
+    window = interval_mask(night_start, night_end) or 0
+    slots = []
+    for offset in range(max_days):
+        o = first + offset
+        free = ~(week[(requested_date.weekday() + offset) % 7] | busy_days.get(o, 0)) & window
+        while free and len(slots) < limit:
+            start = (free & -free).bit_length() - 1
+            filled = free | ((1 << start) - 1)
+            end = (~filled & (filled + 1)).bit_length() - 1   # first busy minute after start
+            if end - start >= duration_minutes:
+                slots.append((date.fromordinal(o), minutes_to_hm(start), minutes_to_hm(start + duration_minutes),
+                              minutes_to_hm(end)))
+            free &= ~((1 << end) - 1)
+        if len(slots) >= limit:
+            break
+    if metrics.ENABLED:
+        metrics.observe("find_group_slots.members", len(members))
+    return slots
+
+def deadline_key(item):
+    if item.get("deadline"):
+        d = parse_iso_date(item["deadline"])
+        return d or dt.max.date()
+    return dt.max.date()
+
+def sort_queue(queue):
+    # Generate order: heaviest first, earlier deadline breaks ties
+    return sorted(queue, key=lambda x: (-x["bobot"], deadline_key(x)))
+
+@metrics.timed("schedule_batch")
+def schedule_batch(index, queue_sorted, default_nim=None, night_start=DEFAULT_NIGHT_START,
+                   night_end=DEFAULT_NIGHT_END, max_days=MAX_DAYS_AHEAD_DEFAULT, db=None):
+    # places the whole (already sorted) queue in one pass and returns (new tasks, unplaced items);
+    # placements match calling find_slot_for_task item by item with the index updated in between
+    days = {}    # (nim, date) -> [first busy minute or None, free gaps], consumed as items land
+    jumps = {}   # (nim, duration) -> {ordinal: next ordinal worth checking}; full days stay full
+    placed, unplaced = [], []
+    on = metrics.ENABLED
+    scanned = 0
+
+    def day_state(nim, d):
+        state = days.get((nim, d))
+        if on:
+            metrics.hit("schedule_batch.days", state is not None)
+        if state is None:
+            merged = merge_intervals(index.busy_for_user(nim, d) + list(class_week(nim, db)[d.weekday()]))
+            state = [merged[0][0] if merged else None, free_gaps(merged, night_start, night_end)]
+            days[(nim, d)] = state
+        return state
+
+    def consume(state, s, e):
+        state[0] = s if state[0] is None else min(state[0], s)
+        gaps = []
+        for gs, ge in state[1]:
+            if ge <= s or gs >= e:
+                gaps.append([gs, ge])
+            else:
+                if gs < s:
+                    gaps.append([gs, s])
+                if e < ge:
+                    gaps.append([e, ge])
+        state[1] = gaps
+
+    def next_open(skip, o):
+        path = []
+        while o in skip:
+            path.append(o)
+            o = skip[o]
+        for p in path:
+            skip[p] = o
+        return o
+
+    for it in queue_sorted:
+        req = parse_iso_date(it["requested_date"])
+        dur = it["duration_minutes"]
+        nim = it.get("user_nim") or default_nim or None
+        skip = jumps.setdefault((nim, dur), {})
+        stop = req.toordinal() + max_days
+        o = next_open(skip, req.toordinal())
+        start = None
+        while o < stop:
+            state = day_state(nim, date.fromordinal(o))
+            start = fit_in_gaps(state[0], state[1], dur, night_start, night_end)
+            scanned += 1
+            if start is not None:
+                break
+            skip[o] = o + 1
+            o = next_open(skip, o + 1)
+        if on and start is not None:
+            metrics.observe("schedule_batch.days_out", o - req.toordinal())
+        if start is None:
+            unplaced.append(it)
+            continue
+        assigned_date = date.fromordinal(o)
+        newtask = {
+            "id": it["id"],
+            "mapel": it["mapel"],
+            "jenis": it["jenis"],
+            "date": assigned_date.isoformat(),
+            "start": minutes_to_hm(start),
+            "end": minutes_to_hm(start + dur),
+            "duration_minutes": dur,
+            "user_nim": nim,
+            "created_at": dt.now().isoformat()
+        }
+        index.add(newtask)
+        consume(state, start, start + dur)
+        placed.append(newtask)
+    if on:
+        metrics.count("schedule_batch.days_scanned", scanned)
+        metrics.count("schedule_batch.placed", len(placed))
+        metrics.count("schedule_batch.unplaced", len(unplaced))
+    return placed, unplaced
+
+def _schedule_partition(job):
+    # worker process: one chunk of students with their stored tasks and timetables
+    tasks, queue_sorted, db, kwargs = job
+    return schedule_batch(ScheduleIndex(tasks), queue_sorted, db=db, **kwargs)
+
+def schedule_cohort(tasks, queue_sorted, default_nim=None, night_start=DEFAULT_NIGHT_START,
+                    night_end=DEFAULT_NIGHT_END, max_days=MAX_DAYS_AHEAD_DEFAULT, workers=None, db=None):
+    # schedule_batch split by user_nim over a process pool. Calendars are per
+    # student, so this places exactly what one schedule_batch(ScheduleIndex(tasks), ...)
+    # call would; results come back in queue order. workers=None uses every core.
+    db = DB if db is None else db
+    kwargs = {"default_nim": default_nim, "night_start": night_start, "night_end": night_end, "max_days": max_days}
+    by_nim = {}
+    for it in queue_sorted:
+        by_nim.setdefault(it.get("user_nim") or default_nim or None, []).append(it)
+    workers = min(workers or os.cpu_count() or 1, len(by_nim))
+    if workers <= 1:
+        return schedule_batch(ScheduleIndex(tasks), queue_sorted, db=db, **kwargs)
+
+    tasks_by_nim = {}
+    for t in tasks:
+        if t.get("user_nim") in by_nim:
+            tasks_by_nim.setdefault(t.get("user_nim"), []).append(t)
+    # a few chunks per worker, biggest students first onto the lightest chunk
+    heap = [(0, i) for i in range(min(len(by_nim), workers * 4))]
+    chunks = [[] for _ in heap]
+    for nim in sorted(by_nim, key=lambda n: len(by_nim[n]), reverse=True):
+        load, i = heapq.heappop(heap)
+        chunks[i].append(nim)
+        heapq.heappush(heap, (load + len(by_nim[nim]) + len(tasks_by_nim.get(nim, ())) // 8, i))
+    jobs = [([t for nim in chunk for t in tasks_by_nim.get(nim, ())],
+             [it for nim in chunk for it in by_nim[nim]],
+             {nim: db[nim] for nim in chunk if nim in db}, kwargs) for chunk in chunks]
+
+    from concurrent.futures import ProcessPoolExecutor
+    placed, unplaced = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for p, u in pool.map(_schedule_partition, jobs):
+            placed.extend(p)
+            unplaced.extend(u)
+    pos = {it["id"]: n for n, it in enumerate(queue_sorted)}
+    placed.sort(key=lambda t: pos[t["id"]])
+    unplaced.sort(key=lambda it: pos[it["id"]])
+    return placed, unplaced
+
+@metrics.timed("generate")
+def generate(store, queue, default_nim=None, night_start=DEFAULT_NIGHT_START, night_end=DEFAULT_NIGHT_END,
+             max_days=MAX_DAYS_AHEAD_DEFAULT, save=True, workers=1, engine="greedy", budget=None):
+    # "Generate & Simpan": schedules the queue against the stored tasks in its
+    # date window and adds the placements in one write; returns (queue in
+    # Generate order, placed tasks, unplaced items). workers > 1 (or None for
+    # every core) partitions the work by user_nim, see schedule_cohort().
+    # engine="deadline" uses optimize.schedule_deadline() with budget seconds.
+    queue_sorted = sort_queue(queue)
+    if not queue_sorted:
+        return queue_sorted, [], []
+    reqs = [parse_iso_date(it["requested_date"]) for it in queue_sorted]
+    # a slot is only blocked by its owner's tasks: read just the queue's students
+    nims = tuple({it.get("user_nim") or default_nim or None for it in queue_sorted})
+    def plan(version):
+        tasks = store.records(user_nim=nims, date_from=min(reqs), date_to=max(reqs) + timedelta(days=max_days - 1))
+        if metrics.ENABLED:
+            metrics.observe("generate.queue_size", len(queue_sorted))
+            metrics.observe("generate.window_tasks", len(tasks))
+        if engine == "deadline":
+            from .optimize import DEFAULT_BUDGET, schedule_deadline
+            placed, unplaced = schedule_deadline(ScheduleIndex(tasks), queue_sorted, default_nim, night_start=night_start,
+                                                 night_end=night_end, max_days=max_days,
+                                                 budget=DEFAULT_BUDGET if budget is None else budget)
+        else:
+            placed, unplaced = schedule_cohort(tasks, queue_sorted, default_nim, night_start=night_start,
+                                               night_end=night_end, max_days=max_days, workers=workers)
+        if save:
+            store.add(placed, expected_version=version)
+        return placed, unplaced
+    placed, unplaced = store.transact(plan)
+    return queue_sorted, placed, unplaced
+
+# -------------------------
+# Priority & duration
+# -------------------------
+JENIS = ["tugas","ujian","praktikum","lainnya"]
+
+def hitung_waktu_belajar(kesulitan):
+    if kesulitan == 1: return 30
+    if kesulitan == 2: return 60
+    if kesulitan == 3: return 90
+    return 120
+
+def hitung_bobot_prioritas(prioritas, kesulitan):
+    return prioritas + kesulitan
+
+# -------------------------
+# ID gen
+# -------------------------
+def gen_id():
+    return str(uuid.uuid4())[:8]
@@ -0,0 +1,1193 @@
+import atexit, heapq, json, logging, os, random, threading, time, sqlite3
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from queue import Empty, Queue
+
+from . import metrics
+from .records import TaskRecord, owners, to_records
+from .recurring import SEP, expand, get_occurrence, split_occurrence_id, task_order
+
+try:
+    import fcntl
+except ImportError:   # Windows: no advisory locks, atomic replace still applies
+    fcntl = None
+
+
+DATA_FILE = "tasks.json"
+USERS_FILE = "users.json"
+LOG_FILE = "tasks.log.jsonl"
+SQLITE_FILE = "tasks.db"
+RULES_FILE = "tasks.recurring.json"
+STORAGE_BACKEND = os.environ.get("STUDY_STORAGE", "json")   # "json" | "log" | "sqlite"
+COMPACT_EVERY = 500   # log records before a background snapshot
+WRITE_BEHIND = os.environ.get("STUDY_WRITE_BEHIND", "0") not in ("", "0")   # get_task_store() writes in the background
+MAX_PENDING_WRITES = 256   # queued writes before writers wait for the disk
+WRITE_RETRIES = 5          # failed background writes tried again before they are dropped
+PENDING_WAIT = 30          # seconds a writer waits for room in a full queue
+log = logging.getLogger("studytracker.storage")
+
+
+def ensure_files_exist():
+    if not os.path.exists(DATA_FILE):
+        with open(DATA_FILE, "w", encoding="utf-8") as f:
+            json.dump([], f, ensure_ascii=False, indent=2)
+    if not os.path.exists(USERS_FILE):
+        # create users.json from demo DB (optional)
+        with open(USERS_FILE, "w", encoding="utf-8") as f:
+            json.dump([], f)
+
+# -------------------------
+# Persistence helpers
+# -------------------------
+def write_json_temp(path, obj, **kwargs):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+def write_json_atomic(path, obj, **kwargs):
+    # readers see either the old or the new file, never a truncated one
+    os.replace(write_json_temp(path, obj, **kwargs), path)
+
+def file_signature(path):
+    # the inode changes with every write_json_atomic(), mtime alone can repeat
+    try:
+        st_ = os.stat(path)
+        return (st_.st_ino, st_.st_mtime_ns, st_.st_size)
+    except OSError:
+        return None
+
+_held = threading.local()   # paths this thread holds file_lock() on
+
+@contextmanager
+def file_lock(path):
+    # advisory lock shared by every process (and thread) writing the same store;
+    # reentrant per thread, so transact() can hold it around a plan's own writes
+    key = os.path.abspath(path)
+    held = _held.__dict__.setdefault("paths", set())
+    if key in held:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class ConflictError(Exception):
+    # the store changed after the caller read the version it passed as expected_version
+    pass
+
+class WriteBehindError(Exception):
+    # a write queued on a WriteBehindStore was dropped: it conflicted with a
+    # write from elsewhere or the disk kept failing (__cause__ says which);
+    # or the queue stayed full
+    pass
+
+def check_version(current, expected):
+    if expected is not None and current != expected:
+        raise ConflictError(f"tasks changed since version {expected!r} (now {current!r})")
+
+def filter_tasks(tasks, user_nim=None, date_from=None, date_to=None, jenis=None):
+    keep = owners(user_nim)
+    lo = date_from.isoformat() if date_from else None
+    hi = date_to.isoformat() if date_to else None
+    rows = [t for t in tasks
+            if (keep is None or t.get("user_nim") in keep)
+            and (lo is None or str(t.get("date")) >= lo)
+            and (hi is None or str(t.get("date")) <= hi)
+            and (jenis is None or t.get("jenis") == jenis)]
+    rows.sort(key=lambda t: (str(t.get("date")), str(t.get("start"))))
+    return rows
+
+def filter_records(records, user_nim=None, date_from=None, date_to=None, jenis=None):
+    # filter_tasks() on TaskRecords, comparing ints; records whose date or start
+    # isn't canonical (kept as text in extra) compare as text, as filter_tasks does
+    keep = owners(user_nim)
+    lo = date_from.toordinal() if date_from else None
+    hi = date_to.toordinal() if date_to else None
+    rows, odd = [], False
+    for r in records:
+        if (keep is not None and r.user_nim not in keep) or (jenis is not None and r.jenis != jenis):
+            continue
+        if r.extra and ("date" in r.extra or "start" in r.extra):
+            odd = True
+            if "date" in r.extra:
+                rows.extend(filter_tasks([r], None, date_from, date_to))
+                continue
+        if (lo is None or r.day >= lo) and (hi is None or r.day <= hi):
+            rows.append(r)
+    if odd:
+        rows.sort(key=lambda r: (str(r.get("date")), str(r.get("start"))))
+    else:
+        rows.sort(key=lambda r: (r.day, r.start))
+    return rows
+
+STORE_METHODS = ("version", "load", "save", "add", "update", "delete", "apply_changes", "get", "query", "records",
+                 "page")
+
+@metrics.instrument("store", STORE_METHODS)
+class TaskStore:
+    # load()/save() move the whole task list; add/update/delete fall back to
+    # _rewrite(). Writes take expected_version and raise ConflictError when the
+    # store moved on since the caller read it (see transact()).
+    def version(self):
+        # changes whenever the stored tasks may have changed (cache key / etag)
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, tasks, expected_version=None):
+        self._rewrite(lambda current: list(tasks), expected_version)
+
+    def _rewrite(self, change, expected_version=None, upserts=None, deletes=()):
+        raise NotImplementedError
+
+    def add(self, tasks, expected_version=None):
+        if tasks:
+            self._rewrite(lambda current: current + list(tasks), expected_version, list(tasks))
+
+    def update(self, task, expected_version=None):
+        self._rewrite(lambda current: [t for t in current if t.get("id") != task.get("id")] + [task], expected_version,
+                      [task])
+
+    def delete(self, task_id, expected_version=None):
+        self._rewrite(lambda current: [t for t in current if t.get("id") != task_id], expected_version, [], [task_id])
+
+    def apply_changes(self, upserts=(), deletes=(), expected_version=None):
+        # several updates/adds/deletes as one write (one version step); updated
+        # tasks keep their place, new ones go to the end
+        new = {t.get("id"): t for t in upserts}
+        gone = set(deletes)
+        def change(current):
+            out = []
+            for t in current:
+                if t.get("id") in gone:
+                    continue
+                out.append(new.pop(t.get("id"), t))
+            return out + list(new.values())
+        if new or gone:
+            self._rewrite(change, expected_version, list(upserts), list(deletes))
+
+    _listeners = ()
+
+    def subscribe(self, fn):
+        # fn(before, after, upserts, deletes) runs after each write made through this
+        # object: the versions around it, tasks added/updated and ids deleted
+        # (upserts None: everything was replaced). Writes from other processes
+        # only show up as a version that moved without a call.
+        self._listeners = self._listeners + (fn,)
+
+    def _notify(self, before, after, upserts, deletes=()):
+        for fn in self._listeners:
+            fn(before, after, upserts, deletes)
+
+    def locked(self):
+        # held by transact() around a plan and its writes: other writers of the
+        # store, in this process or another, wait for it instead of conflicting
+        return nullcontext()
+
+    def transact(self, plan, retries=5):
+        # load -> compute -> save: plan(version) reads what it needs and writes
+        # with expected_version=version, all under locked(). A ConflictError can
+        # still come from a store whose writers don't lock (write-behind); the
+        # plan is then re-run against the fresh data after a jittered backoff
+        for attempt in range(retries):
+            try:
+                with self.locked():
+                    return plan(self.version())
+            except ConflictError:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    def get(self, task_id):
+        return next((t for t in self.load() if t.get("id") == task_id), None)
+
+    def query(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        # tasks sorted by (date, start); None means no filter, dates inclusive;
+        # user_nim may be a tuple of NIMs (see records.owners())
+        return filter_tasks(self.load(), user_nim, date_from, date_to, jenis)
+
+    def records(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        # query() as TaskRecords for the scheduler: dates and times parsed once here
+        return to_records(self.query(user_nim, date_from, date_to, jenis))
+
+    def iter_query(self, user_nim=None, date_from=None, date_to=None, chunk_size=1000, jenis=None):
+        # query() as lists of at most chunk_size tasks, for exports
+        rows = self.query(user_nim, date_from, date_to, jenis)
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
+    def page(self, user_nim=None, date_from=None, date_to=None, jenis=None, offset=0, limit=50):
+        # (rows offset..offset+limit of query(), total matching rows)
+        rows = self.query(user_nim, date_from, date_to, jenis)
+        return rows[offset:offset + limit], len(rows)
+
+@metrics.instrument("store", STORE_METHODS)
+class JsonTaskStore(TaskStore):
+    # whole-file JSON array, rewritten (atomically, under file_lock) on every change
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self._count = (None, 0)   # (version, number of tasks) as last read or written here
+
+    def version(self):
+        return file_signature(self.path) or "missing"   # never None: None means "don't check"
+
+    def load(self):
+        # a missing file is an empty store; a corrupt one is an error, not []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                st_ = os.fstat(f.fileno())
+                tasks = json.load(f)
+            self._count = ((st_.st_ino, st_.st_mtime_ns, st_.st_size), len(tasks))
+            return tasks
+        except FileNotFoundError:
+            self._count = ("missing", 0)
+            return []
+
+    def page(self, user_nim=None, date_from=None, date_to=None, jenis=None, offset=0, limit=50):
+        # a bare count (no filter, limit 0) is answered without reading the file
+        # while it is still the version last read or written here
+        version, count = self._count
+        if limit == 0 and user_nim is None and date_from is None and date_to is None and jenis is None \
+                and version == self.version():
+            return [], count
+        return super().page(user_nim, date_from, date_to, jenis, offset, limit)
+
+    def locked(self):
+        return file_lock(self.path)
+
+    def _rewrite(self, change, expected_version=None, upserts=None, deletes=()):
+        with file_lock(self.path):
+            before = self.version()
+            check_version(before, expected_version)
+            tasks = change(self.load())
+            write_json_atomic(self.path, tasks, ensure_ascii=False, indent=2, default=str)
+            after = self.version()
+            self._count = (after, len(tasks))
+        if metrics.ENABLED:
+            metrics.gauge("store.size", len(tasks))
+        self._notify(before, after, upserts, deletes)
+
+@metrics.instrument("store", STORE_METHODS + ("compact",))
+class LogTaskStore(TaskStore):
+    # DATA_FILE stays the snapshot (same JSON array as JsonTaskStore); changes are
+    # appended to a JSON Lines log of add/update/delete records and folded into a
+    # new snapshot by a background thread every COMPACT_EVERY records
+    def __init__(self, path=DATA_FILE, log_path=LOG_FILE, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.log_path = log_path
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._tasks = {}          # id -> TaskRecord, in insertion order
+        self._snapshot_sig = None
+        self._log_ino = None      # compact() and save() replace the log: replay a new one from its start
+        self._log_pos = 0         # bytes of the log already applied
+        self._log_records = 0
+        self._compactor = None
+        self._refresh()
+
+    def _apply(self, rec):
+        if rec.get("op") in ("add", "update"):
+            self._tasks[rec["task"].get("id")] = TaskRecord.from_dict(rec["task"])
+        elif rec.get("op") == "delete":
+            self._tasks.pop(rec.get("id"), None)
+        elif rec.get("op") == "reset":   # save(): what follows replaces everything before
+            self._tasks = {}
+
+    def _refresh(self):
+        # replay from the last snapshot, then only the log tail not applied yet
+        sig = file_signature(self.path)
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            f = None
+        with f or nullcontext():
+            st_ = os.fstat(f.fileno()) if f else None
+            log_ino, log_size = (st_.st_ino, st_.st_size) if st_ else (None, 0)
+            if sig != self._snapshot_sig or log_ino != self._log_ino or log_size < self._log_pos:
+                self._tasks = {}
+                for i, t in enumerate(JsonTaskStore(self.path).load()):
+                    self._tasks[t.get("id") or f"_row{i}"] = TaskRecord.from_dict(t)
+                self._snapshot_sig = sig
+                self._log_ino = log_ino
+                self._log_pos = 0
+                self._log_records = 0
+            if log_size <= self._log_pos:
+                return
+            f.seek(self._log_pos)
+            data = f.read()
+            end = data.rfind(b"\n") + 1   # leave a torn last line alone
+            for line in data[:end].splitlines():
+                try:
+                    rec = json.loads(line)
+                except:
+                    continue
+                self._apply(rec)
+                self._log_records += 1
+            self._log_pos += end
+
+    def _append(self, records, expected_version=None):
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            before = self._version()
+            check_version(before, expected_version)
+            data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records).encode("utf-8")
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self._log_pos:
+                data = b"\n" + data   # terminate a torn line left by a crash
+            with open(self.log_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._log_ino = os.fstat(f.fileno()).st_ino   # created just now if there was none
+            for r in records:
+                self._apply(r)
+            self._log_pos += len(data)
+            self._log_records += len(records)
+            after = self._version()
+            size = len(self._tasks)
+            if self._log_records >= self.compact_every:
+                self.compact_in_background()
+        if metrics.ENABLED:
+            metrics.gauge("store.size", size)
+        self._notify(before, after, [r["task"] for r in records if r["op"] != "delete"],
+                     [r["id"] for r in records if r["op"] == "delete"])
+
+    def _version(self):
+        return (self._snapshot_sig, self._log_ino, self._log_pos)
+
+    def _replace_log(self, data):
+        # atomically, like write_json_atomic(); -> the new log's inode
+        tmp = f"{self.log_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            ino = os.fstat(f.fileno()).st_ino
+        os.replace(tmp, self.log_path)
+        return ino
+
+    @contextmanager
+    def locked(self):
+        # self._lock first, as every write here takes them
+        with self._lock, file_lock(self.path):
+            yield
+
+    def version(self):
+        with self._lock:
+            self._refresh()
+            return self._version()
+
+    def load(self):
+        with self._lock:
+            self._refresh()
+            return [r.to_dict() for r in self._tasks.values()]
+
+    def get(self, task_id):
+        with self._lock:
+            self._refresh()
+            r = self._tasks.get(task_id)
+            return r.to_dict() if r is not None else None
+
+    def query(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        with self._lock:
+            self._refresh()
+            return [r.to_dict() for r in filter_records(self._tasks.values(), user_nim, date_from, date_to, jenis)]
+
+    def records(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        # the records held in memory, not copies: read-only
+        with self._lock:
+            self._refresh()
+            return filter_records(self._tasks.values(), user_nim, date_from, date_to, jenis)
+
+    def page(self, user_nim=None, date_from=None, date_to=None, jenis=None, offset=0, limit=50):
+        # counted on the records in memory; only the rows returned become dicts
+        with self._lock:
+            self._refresh()
+            if limit == 0 and user_nim is None and date_from is None and date_to is None and jenis is None:
+                return [], len(self._tasks)
+            recs = filter_records(self._tasks.values(), user_nim, date_from, date_to, jenis)
+            return [r.to_dict() for r in recs[offset:offset + limit]], len(recs)
+
+    def save(self, tasks, expected_version=None):
+        # full replace (import): new snapshot, empty log. The tasks go into a new log
+        # behind a reset record first, so a crash at any step replays to either the
+        # old tasks or the new ones, never the old log over the new snapshot
+        tasks = list(tasks)
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            before = self._version()
+            check_version(before, expected_version)
+            records = [{"op": "reset"}] + [{"op": "add", "task": t} for t in tasks]
+            self._replace_log("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+                              .encode("utf-8"))
+            write_json_atomic(self.path, tasks, ensure_ascii=False, indent=2, default=str)
+            self._replace_log(b"")
+            self._snapshot_sig = None
+            self._refresh()
+            after = self._version()
+        if metrics.ENABLED:
+            metrics.gauge("store.size", len(tasks))
+        self._notify(before, after, None)
+
+    def add(self, tasks, expected_version=None):
+        if tasks:
+            self._append([{"op": "add", "task": t} for t in tasks], expected_version)
+
+    def update(self, task, expected_version=None):
+        self._append([{"op": "update", "task": task}], expected_version)
+
+    def delete(self, task_id, expected_version=None):
+        self._append([{"op": "delete", "id": task_id}], expected_version)
+
+    def apply_changes(self, upserts=(), deletes=(), expected_version=None):
+        records = [{"op": "update", "task": t} for t in upserts] + [{"op": "delete", "id": i} for i in deletes]
+        if records:
+            self._append(records, expected_version)
+
+    def compact(self):
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            tasks = [r.to_dict() for r in self._tasks.values()]
+            upto = self._log_pos
+            snapshot_sig, log_sig = self._snapshot_sig, file_signature(self.log_path)
+        tmp = write_json_temp(self.path, tasks, ensure_ascii=False, indent=2, default=str)
+        with self._lock, file_lock(self.path):
+            log_now = file_signature(self.log_path)
+            if file_signature(self.path) != snapshot_sig or (log_sig and (not log_now or log_now[0] != log_sig[0])):
+                # save() or another process replaced the snapshot or the log meanwhile
+                os.remove(tmp)
+                return
+            # replaying records already in the snapshot is harmless (add/update/delete
+            # carry whole records), so a crash between the two renames loses nothing
+            os.replace(tmp, self.path)
+            tail = b""
+            if os.path.exists(self.log_path):
+                with open(self.log_path, "rb") as f:
+                    f.seek(upto)
+                    tail = f.read()
+            log_ino = self._replace_log(tail)
+            if self._snapshot_sig == snapshot_sig and self._log_pos >= upto:
+                before = self._version()
+                self._snapshot_sig = file_signature(self.path)
+                self._log_ino = log_ino
+                self._log_pos -= upto
+                self._log_records = tail.count(b"\n")
+                after = self._version()
+            else:
+                self._snapshot_sig = None   # reloaded in between: start over on next access
+                return
+        self._notify(before, after, [])   # same tasks, new version
+
+    def compact_in_background(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        # not a daemon: an exiting process finishes the snapshot instead of leaving a .tmp
+        self._compactor = threading.Thread(target=self.compact, name="task-log-compactor")
+        self._compactor.start()
+
+@metrics.instrument("store", STORE_METHODS)
+class SqliteTaskStore(TaskStore):
+    # one row per task: the full record as JSON plus indexed id/user_nim/date columns
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT UNIQUE,
+            user_nim TEXT,
+            date TEXT,
+            start_hm TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_date ON tasks(user_nim, date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks(date, start_hm);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path=SQLITE_FILE, migrate_from=DATA_FILE):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+        if migrate_from:
+            self.migrate_from_json(migrate_from)
+
+    def _conn(self):
+        # sqlite3 connections are per thread; Streamlit runs sessions on several
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _bump(conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('version', 1) "
+                     "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    @staticmethod
+    def _version(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def version(self):
+        return self._version(self._conn())
+
+    @contextmanager
+    def locked(self):
+        # one BEGIN IMMEDIATE around the whole plan; its writes become savepoints
+        conn = self._conn()
+        if getattr(self._local, "locked", False):
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.locked = True
+        try:
+            yield
+            conn.commit()
+        except:
+            conn.rollback()
+            raise
+        finally:
+            self._local.locked = False
+
+    @contextmanager
+    def _writing(self, expected_version=None, upserts=None, deletes=()):
+        # BEGIN IMMEDIATE takes SQLite's write lock before the version check
+        conn = self._conn()
+        nested = getattr(self._local, "locked", False)
+        conn.execute("SAVEPOINT write" if nested else "BEGIN IMMEDIATE")
+        try:
+            before = self._version(conn)
+            check_version(before, expected_version)
+            yield conn
+            self._bump(conn)
+            after = self._version(conn)
+            size = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] if metrics.ENABLED else None
+            conn.execute("RELEASE write") if nested else conn.commit()
+        except:
+            if nested:
+                conn.execute("ROLLBACK TO write")
+                conn.execute("RELEASE write")
+            else:
+                conn.rollback()
+            raise
+        if size is not None:
+            metrics.gauge("store.size", size)
+        self._notify(before, after, upserts, deletes)
+
+    @staticmethod
+    def _row(t):
+        return (t.get("id"), t.get("user_nim"), t.get("date"), t.get("start"),
+                json.dumps(t, ensure_ascii=False, default=str))
+
+    def _select(self, where="", params=(), order="seq"):
+        cur = self._conn().execute(f"SELECT data FROM tasks {where} ORDER BY {order}", params)
+        return [json.loads(r[0]) for r in cur]
+
+    def migrate_from_json(self, json_path):
+        # one-time import of an existing tasks.json; later runs leave the table alone
+        with self._conn() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone():
+                return 0
+            tasks = JsonTaskStore(json_path).load() if os.path.exists(json_path) else []
+            if not conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone():
+                conn.executemany("INSERT OR REPLACE INTO tasks (id, user_nim, date, start_hm, data) VALUES (?, ?, ?, ?, ?)",
+                                 [self._row(t) for t in tasks])
+                self._bump(conn)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from', ?)", (os.path.abspath(json_path),))
+        return len(tasks)
+
+    def load(self):
+        return self._select()
+
+    def save(self, tasks, expected_version=None):
+        with self._writing(expected_version) as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.executemany("INSERT OR REPLACE INTO tasks (id, user_nim, date, start_hm, data) VALUES (?, ?, ?, ?, ?)",
+                             [self._row(t) for t in tasks])
+
+    def add(self, tasks, expected_version=None):
+        with self._writing(expected_version, list(tasks)) as conn:
+            conn.executemany("INSERT OR REPLACE INTO tasks (id, user_nim, date, start_hm, data) VALUES (?, ?, ?, ?, ?)",
+                             [self._row(t) for t in tasks])
+
+    def update(self, task, expected_version=None):
+        row = self._row(task)
+        with self._writing(expected_version, [task]) as conn:
+            cur = conn.execute("UPDATE tasks SET user_nim = ?, date = ?, start_hm = ?, data = ? WHERE id = ?", row[1:] + row[:1])
+            if cur.rowcount == 0:
+                conn.execute("INSERT INTO tasks (id, user_nim, date, start_hm, data) VALUES (?, ?, ?, ?, ?)", row)
+
+    def delete(self, task_id, expected_version=None):
+        with self._writing(expected_version, [], [task_id]) as conn:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def apply_changes(self, upserts=(), deletes=(), expected_version=None):
+        if not upserts and not deletes:
+            return
+        with self._writing(expected_version, list(upserts), list(deletes)) as conn:
+            for row in map(self._row, upserts):
+                cur = conn.execute("UPDATE tasks SET user_nim = ?, date = ?, start_hm = ?, data = ? WHERE id = ?",
+                                   row[1:] + row[:1])
+                if cur.rowcount == 0:
+                    conn.execute("INSERT INTO tasks (id, user_nim, date, start_hm, data) VALUES (?, ?, ?, ?, ?)", row)
+            conn.executemany("DELETE FROM tasks WHERE id = ?", [(i,) for i in deletes])
+
+    def get(self, task_id):
+        rows = self._select("WHERE id = ?", (task_id,))
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _where(user_nim=None, date_from=None, date_to=None, jenis=None):
+        where, params, keep = [], [], owners(user_nim)
+        if keep is not None:
+            nims = [n for n in keep if n is not None]
+            either = [f"user_nim IN ({', '.join('?' * len(nims))})"] if nims else []
+            if None in keep:
+                either.append("user_nim IS NULL")
+            where.append("(" + " OR ".join(either) + ")" if either else "0")
+            params.extend(nims)
+        if date_from:
+            where.append("date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            where.append("date <= ?")
+            params.append(date_to.isoformat())
+        if jenis is not None:
+            where.append("json_extract(data, '$.jenis') = ?")
+            params.append(jenis)
+        return ("WHERE " + " AND ".join(where) if where else ""), params
+
+    def query(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        return self._select(*self._where(user_nim, date_from, date_to, jenis), order="date, start_hm, seq")
+
+    def page(self, user_nim=None, date_from=None, date_to=None, jenis=None, offset=0, limit=50):
+        where, params = self._where(user_nim, date_from, date_to, jenis)
+        total = self._conn().execute(f"SELECT COUNT(*) FROM tasks {where}", params).fetchone()[0]
+        rows = self._select(where, params + [limit, offset], order="date, start_hm, seq LIMIT ? OFFSET ?")
+        return rows, total
+
+    def iter_query(self, user_nim=None, date_from=None, date_to=None, chunk_size=1000, jenis=None):
+        # streamed off the cursor: only one chunk is in memory at a time
+        where, params = self._where(user_nim, date_from, date_to, jenis)
+        cur = self._conn().execute(f"SELECT data FROM tasks {where} ORDER BY date, start_hm, seq", params)
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [json.loads(r[0]) for r in rows]
+        finally:
+            cur.close()
+
+class RuleStore:
+    # recurring task rules (recurring.py) as one JSON array, re-read only when the file changes
+    def __init__(self, path=RULES_FILE):
+        self.path = path
+        self._cached = (None, [])
+
+    def version(self):
+        return file_signature(self.path)
+
+    def load(self):
+        sig = file_signature(self.path)
+        if sig is None:
+            return []
+        cached = self._cached
+        if cached[0] != sig:
+            cached = self._cached = (sig, JsonTaskStore(self.path).load())
+        return cached[1]
+
+    def rewrite(self, change, expected_version=None):
+        # -> (version before, version after)
+        with file_lock(self.path):
+            before = self.version()
+            check_version(before, expected_version)
+            write_json_atomic(self.path, change([dict(r) for r in self.load()]), ensure_ascii=False, indent=2,
+                              default=str)
+            return before, self.version()
+
+class RecurringTaskStore(TaskStore):
+    # A store plus weekly rules: reads add the occurrences of the rules inside
+    # the window asked for to the stored tasks, and a write to an occurrence id
+    # ("<rule id>@<date>") becomes that date's exception in its rule, not a row.
+    # load()/save() move the stored tasks only. open_task_store() returns these.
+    def __init__(self, store, rules):
+        self.store = store
+        self.rules = rules
+        store.subscribe(self._on_store_write)
+
+    def _on_store_write(self, before, after, upserts, deletes):
+        rules_version = self.rules.version()
+        self._notify((before, rules_version), (after, rules_version), upserts, deletes)
+
+    def version(self):
+        return (self.store.version(), self.rules.version())
+
+    @contextmanager
+    def locked(self):
+        with self.store.locked(), file_lock(self.rules.path):
+            yield
+
+    def _occurrences(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        rules = self.rules.load()
+        return list(expand(rules, date_from, date_to, user_nim, jenis)) if rules else []
+
+    def _rule_of(self, task_id):
+        occ = split_occurrence_id(task_id)
+        if occ is not None:
+            rule = next((r for r in self.rules.load() if r["id"] == occ[0]), None)
+            if rule is not None:
+                return rule, occ[1]
+        return None
+
+    def load(self):
+        return self.store.load()
+
+    def get(self, task_id):
+        hit = self._rule_of(task_id)
+        return get_occurrence(*hit) if hit else self.store.get(task_id)
+
+    def query(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        rows = self.store.query(user_nim, date_from, date_to, jenis)
+        occ = self._occurrences(user_nim, date_from, date_to, jenis)
+        return sorted(rows + occ, key=task_order) if occ else rows
+
+    def records(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        rows = self.store.records(user_nim, date_from, date_to, jenis)
+        occ = self._occurrences(user_nim, date_from, date_to, jenis)
+        return filter_records(list(rows) + to_records(occ)) if occ else rows
+
+    def page(self, user_nim=None, date_from=None, date_to=None, jenis=None, offset=0, limit=50):
+        # the first offset + limit of the merged order come from the first offset + limit of each side
+        occ = self._occurrences(user_nim, date_from, date_to, jenis)
+        if not occ:
+            return self.store.page(user_nim, date_from, date_to, jenis, offset, limit)
+        rows, total = self.store.page(user_nim, date_from, date_to, jenis, 0, offset + limit)
+        return sorted(rows + occ[:offset + limit], key=task_order)[offset:offset + limit], total + len(occ)
+
+    def iter_query(self, user_nim=None, date_from=None, date_to=None, chunk_size=1000, jenis=None):
+        occ = self._occurrences(user_nim, date_from, date_to, jenis)
+        if not occ:
+            yield from self.store.iter_query(user_nim, date_from, date_to, chunk_size, jenis)
+            return
+        stored = (t for chunk in self.store.iter_query(user_nim, date_from, date_to, chunk_size, jenis) for t in chunk)
+        chunk = []
+        for t in heapq.merge(stored, occ, key=task_order):
+            chunk.append(t)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _split(self, upserts, deletes):
+        # -> (stored upserts, stored deletes, {rule id: {date: task or None}})
+        ups, dels, exceptions = [], [], {}
+        for t in upserts:
+            hit = self._rule_of(t.get("id"))
+            if hit:
+                exceptions.setdefault(hit[0]["id"], {})[hit[1].isoformat()] = dict(t, rule_id=hit[0]["id"])
+            else:
+                ups.append(t)
+        for task_id in deletes:
+            hit = self._rule_of(task_id)
+            if hit:
+                exceptions.setdefault(hit[0]["id"], {})[hit[1].isoformat()] = None
+            else:
+                dels.append(task_id)
+        return ups, dels, exceptions
+
+    def _write_rules(self, change, expected_version=None, upserts=None, deletes=()):
+        expected = expected_version[1] if expected_version is not None else None
+        if expected_version is not None:
+            check_version(self.store.version(), expected_version[0])
+        before, after = self.rules.rewrite(change, expected)
+        stored = self.store.version()
+        self._notify((stored, before), (stored, after), upserts, deletes)
+
+    def _write_exceptions(self, exceptions, expected_version=None):
+        def change(rules):
+            for r in rules:
+                if r["id"] in exceptions:
+                    r["exceptions"] = dict(r.get("exceptions") or {}, **exceptions[r["id"]])
+            return rules
+        moved = [t for ex in exceptions.values() for t in ex.values() if t]
+        gone = [f"{rule_id}{SEP}{d}" for rule_id, ex in exceptions.items() for d, t in ex.items() if t is None]
+        self._write_rules(change, expected_version, moved, gone)
+
+    def save(self, tasks, expected_version=None):
+        tasks, _, exceptions = self._split(list(tasks), ())
+        self.store.save(tasks, expected_version[0] if expected_version is not None else None)
+        if exceptions:
+            self._write_exceptions(exceptions)
+
+    def _write(self, upserts, deletes, expected_version, write):
+        # write(stored upserts, stored deletes, expected version of the store) for
+        # ordinary tasks, then one rules write for the occurrences among them
+        ups, dels, exceptions = self._split(upserts, deletes)
+        if ups or dels:
+            if expected_version is not None:
+                check_version(self.rules.version(), expected_version[1])
+            write(ups, dels, expected_version[0] if expected_version is not None else None)
+            expected_version = None   # checked; the rules write follows ours
+        if exceptions:
+            self._write_exceptions(exceptions, expected_version)
+
+    def add(self, tasks, expected_version=None):
+        if tasks:
+            self._write(list(tasks), [], expected_version, lambda ups, dels, v: self.store.add(ups, v))
+
+    def update(self, task, expected_version=None):
+        self._write([task], [], expected_version, lambda ups, dels, v: self.store.update(ups[0], v))
+
+    def delete(self, task_id, expected_version=None):
+        self._write([], [task_id], expected_version, lambda ups, dels, v: self.store.delete(dels[0], v))
+
+    def apply_changes(self, upserts=(), deletes=(), expected_version=None):
+        if upserts or deletes:
+            self._write(list(upserts), list(deletes), expected_version, self.store.apply_changes)
+
+    def list_rules(self, user_nim=None):
+        return [r for r in self.rules.load() if user_nim is None or r.get("user_nim") == user_nim]
+
+    def add_rule(self, rule):
+        self._write_rules(lambda rules: rules + [rule])
+
+    def delete_rule(self, rule_id):
+        # the rule and every occurrence of it, exceptions included
+        self._write_rules(lambda rules: [r for r in rules if r["id"] != rule_id])
+
+_DELETED = object()
+
+@metrics.instrument("write_behind", ("save", "add", "update", "delete", "apply_changes", "flush"))
+class WriteBehindStore(TaskStore):
+    # Wraps a store so writes return once queued: a daemon thread takes
+    # everything queued, folds it into one apply_changes() (or save()) on the
+    # wrapped store and repeats, so a burst of edits costs one disk write.
+    # Reads through this object see queued writes (read-your-writes): pending
+    # tasks are laid over what the wrapped store returns until they are written.
+    # A write queued with expected_version is checked against this object when
+    # queued and again on disk when flushed: the batch is written with the store
+    # version our own writes left, so a write from another process in between
+    # makes the checked writes drop instead of overwriting it. A batch still
+    # failing after WRITE_RETRIES is dropped too. Every queued write gets a
+    # ticket (a Future) that ends with None once written or WriteBehindError
+    # once dropped; only the thread that queued it hears about it, through
+    # take_tickets() or flush(). Pending writes are flushed at exit.
+    def __init__(self, store, max_pending=MAX_PENDING_WRITES):
+        self.store = store
+        self._queue = Queue()
+        self._room = threading.BoundedSemaphore(max_pending)   # taken per queued write, before _put_lock
+        self._lock = threading.Lock()
+        self._put_lock = threading.Lock()   # queue order == seq order
+        self._written_cond = threading.Condition(self._lock)
+        self._overlay = {}     # id -> (seq, task or _DELETED) not written yet
+        self._replace = None   # (seq, tasks) of a save() not written yet
+        self._seq = 0          # writes queued
+        self._written = 0      # writes written or dropped
+        self._epoch = 0        # bumped when the wrapped store changes without us (or a write drops)
+        self._foreign = 0      # epoch of the last write from elsewhere: checked writes older than it drop
+        self._noticed = None   # (before, after, epoch, foreign before) of that write, until it proves a compaction
+        self._seen = store.version()
+        self._writing = False  # the worker is writing: a moved store version is ours
+        self.error = None      # last failed write attempt, cleared when one succeeds
+        self._local = threading.local()   # .tickets: this thread's writes not taken yet
+        store.subscribe(self._on_store_write)
+        self._worker = threading.Thread(target=self._run, name="task-store-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self._wait, 60)
+
+    def version(self):
+        # (epoch, writes queued): moves with every write, queued or from elsewhere
+        current = self.store.version()
+        with self._lock:
+            if current != self._seen and not self._writing:
+                self._epoch += 1
+                self._noticed = (self._seen, current, self._epoch, self._foreign)
+                self._seen, self._foreign = current, self._epoch
+            return (self._epoch, self._seq)
+
+    def _on_store_write(self, before, after, upserts, deletes):
+        # our own flushes (and log compactions) don't change what reads return;
+        # writes made straight on the wrapped store (rules) bump the epoch in version()
+        with self._lock:
+            same = upserts == [] and not deletes
+            if before == self._seen and (threading.current_thread() is self._worker or same):
+                self._seen = after
+            elif same and self._noticed is not None and self._noticed[:2] == (before, after):
+                # version() got to a compaction before its notice did: not a write from elsewhere
+                if self._foreign == self._noticed[2]:
+                    self._foreign = self._noticed[3]
+                self._noticed = None
+
+    def pending(self):
+        return self._seq - self._written
+
+    def take_tickets(self):
+        # the tickets of the writes this thread queued since the last call
+        tickets, self._local.tickets = getattr(self._local, "tickets", []), []
+        return tickets
+
+    def _enqueue(self, replace, upserts, deletes, expected_version):
+        if not self._room.acquire(timeout=PENDING_WAIT):
+            raise WriteBehindError(f"{self.pending()} writes still queued after {PENDING_WAIT}s") from self.error
+        try:
+            with self._put_lock:
+                before = self.version()
+                with self._lock:
+                    check_version(before, expected_version)
+                    self._seq += 1
+                    seq = self._seq
+                    if replace is not None:
+                        self._replace = (seq, replace)
+                        self._overlay.clear()
+                    for t in upserts:
+                        self._overlay[t.get("id")] = (seq, t)
+                    for task_id in deletes:
+                        self._overlay[task_id] = (seq, _DELETED)
+                    after = (self._epoch, seq)
+                    ticket = Future()
+                    self._queue.put((seq, self._epoch, expected_version is not None, replace, upserts, deletes, ticket))
+        except BaseException:
+            self._room.release()
+            raise
+        # written tickets are news to nobody; keep the pending and the dropped ones
+        tickets = getattr(self._local, "tickets", [])
+        self._local.tickets = [t for t in tickets if not t.done() or t.exception() is not None] + [ticket]
+        if metrics.ENABLED:
+            metrics.gauge("write_behind.pending", self.pending())
+        self._notify(before, after, None if replace is not None else upserts, deletes)
+
+    def save(self, tasks, expected_version=None):
+        self._enqueue(list(tasks), [], [], expected_version)
+
+    def add(self, tasks, expected_version=None):
+        if tasks:
+            self._enqueue(None, list(tasks), [], expected_version)
+
+    def update(self, task, expected_version=None):
+        self._enqueue(None, [task], [], expected_version)
+
+    def delete(self, task_id, expected_version=None):
+        self._enqueue(None, [], [task_id], expected_version)
+
+    def apply_changes(self, upserts=(), deletes=(), expected_version=None):
+        if upserts or deletes:
+            self._enqueue(None, list(upserts), list(deletes), expected_version)
+
+    @staticmethod
+    def _merged(tasks, changes):
+        # tasks with changes (id -> task or _DELETED) applied, as apply_changes() does
+        changes = dict(changes)
+        out = []
+        for t in tasks:
+            new = changes.pop(t.get("id"), t)
+            if new is not _DELETED:
+                out.append(new)
+        return out + [t for t in changes.values() if t is not _DELETED]
+
+    def _write(self, batch, seen):
+        # one write of the queued items; checked ones expect the store at seen
+        replace, changes, checked = None, {}, False
+        for seq, epoch, check, rep, upserts, deletes, ticket in batch:
+            if rep is not None:
+                replace, changes = rep, {}
+            for t in upserts:
+                changes[t.get("id")] = t
+            for task_id in deletes:
+                changes[task_id] = _DELETED
+            checked = checked or check
+        expected = seen if checked else None
+        if replace is not None:
+            self.store.save(self._merged(replace, changes), expected)
+        else:
+            self.store.apply_changes([t for t in changes.values() if t is not _DELETED],
+                                     [i for i, t in changes.items() if t is _DELETED], expected)
+
+    def _split(self, batch):
+        # (store version, stale, fresh): checked writes queued before the last write
+        # from elsewhere were planned on old data. A log compaction noticed by
+        # version() just before its own notice arrives looks like such a write for
+        # a moment, so a stale verdict is taken again once that notice has landed.
+        for wait in (0, 0.05):
+            time.sleep(wait)
+            self.version()
+            with self._lock:
+                stale = [item for item in batch if item[2] and item[1] < self._foreign]
+                if not stale or wait:
+                    return self._seen, stale, [item for item in batch if not (item[2] and item[1] < self._foreign)]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+            seen, dropped, todo = self._split(batch)
+            cause, attempts, rechecked = ConflictError(f"tasks changed since version {seen!r}") if dropped else None, 0, False
+            with self._lock:
+                self._writing = True
+            while todo:
+                try:
+                    self._write(todo, seen)
+                    with self._lock:
+                        self.error = None
+                    break
+                except Exception as e:
+                    if isinstance(e, ConflictError) and any(item[2] for item in todo):
+                        if not rechecked:
+                            # the disk moved since _split(): a compaction or a real conflict
+                            rechecked = True
+                            with self._lock:
+                                self._writing = False
+                            seen, stale, _ = self._split(todo)
+                            with self._lock:
+                                self._writing = True
+                            if not stale:
+                                continue
+                        dropped += [item for item in todo if item[2]]
+                        todo, cause = [item for item in todo if not item[2]], e
+                        continue
+                    attempts += 1
+                    with self._lock:
+                        self.error = cause = e
+                    if attempts > WRITE_RETRIES:
+                        log.exception("background write of %d queued writes failed, dropped", len(todo))
+                        dropped += todo
+                        break
+                    log.exception("background write of %d queued writes failed, retrying", len(todo))
+                    time.sleep(1)
+            if metrics.ENABLED:
+                metrics.observe("write_behind.batch", len(batch))
+                if dropped:
+                    metrics.observe("write_behind.dropped", len(dropped))
+            if dropped and isinstance(cause, ConflictError):
+                log.warning("%d queued writes dropped: %s", len(dropped), cause)
+            last, gone = batch[-1][0], {item[0] for item in dropped}
+            with self._lock:
+                self._writing = False
+                if dropped:
+                    self._epoch += 1   # their overlay goes away, cached reads must reload
+                for item in batch:   # before _written moves: flush() reads them right after
+                    if item[0] in gone:
+                        error = WriteBehindError(f"queued write was not saved: {cause}")
+                        error.__cause__ = cause
+                        item[-1].set_exception(error)
+                    else:
+                        item[-1].set_result(None)
+                self._written = last
+                if self._replace and self._replace[0] <= last:
+                    self._replace = None
+                self._overlay = {k: v for k, v in self._overlay.items() if v[0] > last}
+                self._written_cond.notify_all()
+            for _ in batch:
+                self._room.release()
+
+    def _wait(self, timeout=None):
+        # every write queued so far written or dropped; False on timeout
+        with self._lock:
+            target = self._seq
+            return self._written_cond.wait_for(lambda: self._written >= target, timeout)
+
+    def flush(self, timeout=None):
+        # _wait(), then WriteBehindError if a write this thread queued was dropped
+        done = self._wait(timeout)
+        tickets = self.take_tickets()
+        self._local.tickets = [t for t in tickets if not t.done()]
+        for t in tickets:
+            if t.done() and t.exception() is not None:
+                raise t.exception()
+        return done
+
+    def _pending(self):
+        with self._lock:
+            return self._replace, {k: v[1] for k, v in self._overlay.items()}
+
+    # recurring rules are written straight through (RecurringTaskStore)
+    def list_rules(self, user_nim=None):
+        return self.store.list_rules(user_nim)
+
+    def add_rule(self, rule):
+        self.store.add_rule(rule)
+
+    def delete_rule(self, rule_id):
+        self.store.delete_rule(rule_id)
+
+    def load(self):
+        replace, overlay = self._pending()
+        return self._merged(replace[1] if replace else self.store.load(), overlay)
+
+    def get(self, task_id):
+        replace, overlay = self._pending()
+        if task_id in overlay:
+            t = overlay[task_id]
+            return None if t is _DELETED else t
+        if replace:
+            return next((t for t in replace[1] if t.get("id") == task_id), None)
+        return self.store.get(task_id)
+
+    def query(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        replace, overlay = self._pending()
+        if replace:
+            return filter_tasks(self._merged(replace[1], overlay), user_nim, date_from, date_to, jenis)
+        rows = self.store.query(user_nim, date_from, date_to, jenis)
+        if not overlay:
+            return rows
+        rows = [t for t in rows if t.get("id") not in overlay]
+        return filter_tasks(rows + [t for t in overlay.values() if t is not _DELETED], user_nim, date_from, date_to,
+                            jenis)
+
+    def records(self, user_nim=None, date_from=None, date_to=None, jenis=None):
+        if self._replace is None and not self._overlay:
+            return self.store.records(user_nim, date_from, date_to, jenis)
+        return to_records(self.query(user_nim, date_from, date_to, jenis))
+
+    def iter_query(self, user_nim=None, date_from=None, date_to=None, chunk_size=1000, jenis=None):
+        if self._replace is None and not self._overlay:
+            return self.store.iter_query(user_nim, date_from, date_to, chunk_size, jenis)
+        return super().iter_query(user_nim, date_from, date_to, chunk_size, jenis)
+
+    def page(self, user_nim=None, date_from=None, date_to=None, jenis=None, offset=0, limit=50):
+        if self._replace is None and not self._overlay:
+            return self.store.page(user_nim, date_from, date_to, jenis, offset, limit)
+        return super().page(user_nim, date_from, date_to, jenis, offset, limit)
+
+def open_task_store(backend=None, path=DATA_FILE):
+    # backend defaults to $STUDY_STORAGE; the log/db live next to path
+    # (tasks.json -> tasks.log.jsonl / tasks.db)
+    backend = backend or STORAGE_BACKEND
+    stem = os.path.splitext(path)[0]
+    if backend == "log":
+        store = LogTaskStore(path, stem + ".log.jsonl")
+    elif backend == "sqlite":
+        store = SqliteTaskStore(stem + ".db", migrate_from=path)
+    else:
+        store = JsonTaskStore(path)
+    return RecurringTaskStore(store, RuleStore(stem + ".recurring.json"))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_task_store():
+    # one store per process, shared by every Streamlit session and rerun; with
+    # WRITE_BEHIND its writes go to disk on a background thread
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = open_task_store()
+            if WRITE_BEHIND:
+                _store = WriteBehindStore(_store)
+        return _store
@@ -0,0 +1,75 @@
+from datetime import date, datetime as dt, timedelta
+
+from . import metrics
+
+
+# -------------------------
+# Time helpers
+# -------------------------
+def hm_to_minutes(hm):
+    h, m = map(int, hm.split(":"))
+    return h*60 + m
+
+def minutes_to_hm(minutes):
+    h = minutes // 60
+    m = minutes % 60
+    return f"{h:02d}:{m:02d}"
+
+def parse_iso_date(s):
+    try:
+        return dt.strptime(s, "%Y-%m-%d").date()
+    except:
+        return None
+
+# -------------------------
+# Weekdays
+# -------------------------
+WEEKDAY_MAP = {"Senin":0,"Selasa":1,"Rabu":2,"Kamis":3,"Jumat":4,"Sabtu":5,"Minggu":6}
+IDX_TO_DAY = {v:k for k,v in WEEKDAY_MAP.items()}
+
+def convert_weekday_to_date(weekday, week_number, month, year):
+    weekday = weekday.capitalize()
+    if weekday not in WEEKDAY_MAP:
+        return None
+    target = WEEKDAY_MAP[weekday]
+    try:
+        d = date(year, month, 1)
+    except:
+        return None
+    count = 0
+    while d.month == month:
+        if d.weekday() == target:
+            count += 1
+            if count == week_number:
+                return d
+        d += timedelta(days=1)
+    return None
+
+def merge_intervals(intervals):
+    if not intervals:
+        return []
+    if metrics.ENABLED:
+        metrics.count("merge_intervals.intervals", len(intervals))
+    intervals = sorted(intervals, key=lambda x: x[0])
+    merged = [list(intervals[0])]
+    for s,e in intervals[1:]:
+        if s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s,e])
+    return merged
+
+def interval_mask(start, end):
+    # bit m set = minute m is taken; None for intervals a bitmap can't stand in for
+    if start < 0 or end <= start:
+        return None
+    return ((1 << (end - start)) - 1) << start
+
+def intervals_mask(intervals):
+    mask = 0
+    for s, e in intervals:
+        bits = interval_mask(s, e)
+        if bits is None:
+            return None
+        mask |= bits
+    return mask
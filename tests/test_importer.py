@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from studytracker.cli import main
+from studytracker.importer import import_queue, import_timetables, read_queue
+
+ROWS = [
+    {"mapel": "Kalkulus", "requested_date": "2026-03-02", "user_nim": "16725186"},
+    {"mapel": "Fisika", "hari": "rabu", "minggu_ke": "2", "bulan": "3", "tahun": "2026", "jenis": "Ujian",
+     "deadline": "2026-03-20", "prioritas": "4", "kesulitan": "3", "id": "f1"},
+    {"mapel": "Kimia", "requested_date": "2026-03-02", "duration_minutes": "45", "kesulitan": "1"},
+    {"mapel": "", "requested_date": "2026-03-02"},
+    {"mapel": "Biologi", "requested_date": "2026-02-30"},
+    {"mapel": "Biologi", "hari": "Rabu", "minggu_ke": "6", "bulan": "3", "tahun": "2026"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "deadline": "besok"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "prioritas": "5"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "kesulitan": "x"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "duration_minutes": "abc"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "duration_minutes": "-30"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "duration_minutes": "2.5"},
+    {"mapel": "Biologi", "requested_date": "2026-03-02", "jenis": "kuis"},
+]
+COLS = sorted({c for r in ROWS for c in r})
+
+
+def write_queue(path, rows, fmt):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            f.write(",".join(COLS) + "\n")
+            f.writelines(",".join(r.get(c, "") for c in COLS) + "\n" for r in rows)
+        elif fmt == "jsonl":
+            f.writelines(json.dumps(r) + "\n" for r in rows)
+        else:
+            json.dump(rows, f)
+    return str(path)
+
+def comparable(items):
+    return [{k: v for k, v in it.items() if k != "created_at" and not (k == "id" and v != "f1")} for it in items]
+
+
+@pytest.mark.parametrize("fmt", ("csv", "jsonl", "json"))
+def test_stdlib_reader_matches_pandas_importer(fmt, tmp_path):
+    path = write_queue(tmp_path / f"queue.{fmt}", ROWS, fmt)
+    items, errors = read_queue(path, default_nim="13523001")
+    expected_items, expected_errors = import_queue(path, default_nim="13523001")
+    assert comparable(items) == comparable(expected_items)
+    assert errors == expected_errors
+    assert [it["mapel"] for it in items] == ["Kalkulus", "Fisika", "Kimia"]
+    assert [it["duration_minutes"] for it in items] == [60, 90, 45]
+    assert items[1]["requested_date"] == "2026-03-11" and items[1]["user_nim"] == "13523001"
+    assert [e["row"] for e in errors] == list(range(4, len(ROWS) + 1))
+
+@pytest.mark.parametrize("read", (read_queue, import_queue))
+def test_bad_duration_is_a_bad_row(read, tmp_path):
+    path = write_queue(tmp_path / "queue.csv", [ROWS[9], ROWS[0]], "csv")
+    items, errors = read(path)
+    assert [it["mapel"] for it in items] == ["Kalkulus"]
+    assert errors == [{"row": 1, "error": "duration_minutes harus bilangan bulat positif"}]
+
+@pytest.mark.parametrize("content", ("", "mapel,requested_date\n"))
+def test_empty_files_have_no_rows(content, tmp_path, capsys):
+    path = tmp_path / "queue.csv"
+    path.write_text(content)
+    assert read_queue(str(path)) == ([], []) == import_queue(str(path))
+    assert import_timetables(str(path), path=str(tmp_path / "users.json")) == ({}, [])
+    for command in ("schedule", "import"):
+        assert main([command, str(path), "--data", str(tmp_path / "tasks.json"), "--users", str(tmp_path / "users.json")]) == 1
+        assert "no rows" in capsys.readouterr().err
@@ -0,0 +1,87 @@
+import json
+from datetime import date
+
+import pytest
+
+from studytracker.recurring import expand, make_rule
+from studytracker.replan import replan
+from studytracker.scheduler import generate
+from studytracker.storage import open_task_store
+
+NIM = "16725186"
+MON = date(2026, 3, 2)
+
+
+def weekly(**kwargs):
+    # Rabu 19:00-20:30 from the first Rabu on or after MON
+    return make_rule("Revisi", "tugas", "rabu", "19:00", 90, MON, user_nim=NIM, **kwargs)
+
+def dates(tasks):
+    return [t["date"] for t in tasks]
+
+
+def test_make_rule():
+    rule = weekly()
+    assert (rule["hari"], rule["date_from"], rule["end"]) == ("Rabu", "2026-03-04", "20:30")
+    with pytest.raises(ValueError):
+        make_rule("x", "tugas", "Caturday", "19:00", 60, MON)
+    with pytest.raises(ValueError):
+        make_rule("x", "tugas", "Rabu", "23:30", 60, MON)
+
+def test_expand_only_the_window():
+    rule = weekly(every_weeks=2, date_to=date(2026, 5, 1))
+    assert dates(expand([rule], date(2026, 3, 10), date(2026, 4, 30))) == ["2026-03-18", "2026-04-01", "2026-04-15",
+                                                                          "2026-04-29"]
+    assert dates(expand([rule], date(2026, 4, 30), date(2026, 12, 31))) == []   # past date_to
+    assert dates(expand([rule], date(2026, 3, 1), date(2026, 3, 3))) == []
+    assert dates(expand([rule], date(2026, 3, 1), date(2026, 4, 1), user_nim="13523001")) == []
+
+@pytest.mark.parametrize("backend", ("json", "log", "sqlite"))
+def test_store_keeps_one_rule_not_rows(backend, tmp_path):
+    store = open_task_store(backend, str(tmp_path / "tasks.json"))
+    rule = weekly()
+    store.add_rule(rule)
+    store.add([{"id": "t1", "mapel": "M", "jenis": "tugas", "date": "2026-03-11", "start": "21:00", "end": "22:00",
+                "duration_minutes": 60, "user_nim": NIM}])
+    assert [t["id"] for t in store.load()] == ["t1"]   # occurrences are never stored
+    with open(tmp_path / "tasks.recurring.json") as f:
+        assert [r["id"] for r in json.load(f)] == [rule["id"]]
+    window = store.query(user_nim=NIM, date_from=MON, date_to=date(2026, 3, 31))
+    assert [(t["id"], t["date"]) for t in window] == [
+        (f"{rule['id']}@2026-03-04", "2026-03-04"), (f"{rule['id']}@2026-03-11", "2026-03-11"), ("t1", "2026-03-11"),
+        (f"{rule['id']}@2026-03-18", "2026-03-18"), (f"{rule['id']}@2026-03-25", "2026-03-25")]
+    assert store.page(user_nim=NIM, date_from=MON, date_to=date(2026, 3, 31), offset=1, limit=2) == (window[1:3], 5)
+    assert [t for chunk in store.iter_query(NIM, MON, date(2026, 3, 31), chunk_size=2) for t in chunk] == window
+    assert store.get(f"{rule['id']}@2026-03-11")["date"] == "2026-03-11"
+    assert store.get(f"{rule['id']}@2026-03-12") is None   # not a Rabu
+
+@pytest.mark.parametrize("backend", ("json", "sqlite"))
+def test_occurrence_exceptions(backend, tmp_path):
+    store = open_task_store(backend, str(tmp_path / "tasks.json"))
+    rule = weekly()
+    store.add_rule(rule)
+    skipped, moved = f"{rule['id']}@2026-03-11", f"{rule['id']}@2026-03-18"
+    store.delete(skipped)
+    store.update(dict(store.get(moved), date="2026-03-19", start="21:00", end="22:30"))
+    window = store.query(date_from=MON, date_to=date(2026, 3, 31))
+    assert [(t["id"], t["date"], t["start"]) for t in window] == [
+        (f"{rule['id']}@2026-03-04", "2026-03-04", "19:00"), (moved, "2026-03-19", "21:00"),
+        (f"{rule['id']}@2026-03-25", "2026-03-25", "19:00")]
+    assert store.get(skipped) is None and store.load() == []
+    assert set(store.list_rules(NIM)[0]["exceptions"]) == {"2026-03-11", "2026-03-18"}
+    store.delete_rule(rule["id"])
+    assert store.query(date_from=MON, date_to=date(2026, 3, 31)) == []
+
+def test_scheduler_and_replan_see_occurrences(tmp_path):
+    store = open_task_store("json", str(tmp_path / "tasks.json"))
+    rule = weekly()
+    store.add_rule(rule)
+    item = {"id": "q1", "mapel": "Q", "jenis": "tugas", "requested_date": "2026-03-04", "duration_minutes": 60,
+            "bobot": 4, "user_nim": NIM}
+    _, placed, _ = generate(store, [item], max_days=7)
+    assert [(t["date"], t["start"]) for t in placed] == [("2026-03-04", "20:30")]   # after the rule's block
+    # moving an occurrence through replan() becomes an exception of its rule
+    diff = replan(store, {"op": "move", "id": f"{rule['id']}@2026-03-11", "date": date(2026, 3, 12)})
+    assert [(t["date"], t["start"]) for t in diff["updated"]] == [("2026-03-12", "19:00")]
+    assert [t["id"] for t in store.load()] == ["q1"]
+    assert store.list_rules()[0]["exceptions"]["2026-03-11"]["date"] == "2026-03-12"
@@ -0,0 +1,90 @@
+from datetime import date
+
+import pytest
+
+from studytracker.replan import NoOwnerError, replan
+from studytracker.storage import open_task_store
+
+NIM = "16725186"
+
+
+def task(i, day=2, start=19, nim=NIM, minutes=60):
+    return {"id": f"t{i}", "mapel": f"M{i}", "jenis": "tugas", "date": f"2026-03-{day:02d}", "start": f"{start}:00",
+            "end": f"{start + minutes // 60}:{minutes % 60:02d}", "duration_minutes": minutes, "user_nim": nim}
+
+
+def test_ownerless_task_needs_an_owner(tmp_path):
+    store = open_task_store("json", str(tmp_path / "tasks.json"))
+    store.add([task(1, nim=None), task(2, nim="13523001"), task(3, start=20)])
+    asked, records = [], store.records
+    store.records = lambda user_nim=None, **kwargs: asked.append(user_nim) or records(user_nim, **kwargs)
+    with pytest.raises(NoOwnerError):
+        replan(store, {"op": "resize", "id": "t1", "duration_minutes": 120})
+    assert asked == [] and store.get("t1") == task(1, nim=None)
+    # with a default owner the task becomes theirs and only their days are read
+    diff = replan(store, {"op": "resize", "id": "t1", "duration_minutes": 120}, default_nim=NIM)
+    assert asked == [NIM]
+    assert diff["updated"] == [dict(task(1), start="21:00", end="23:00", duration_minutes=120)]   # after t3, not t2
+    assert store.get("t1")["user_nim"] == NIM
+
+def make_store(tmp_path, tasks):
+    store = open_task_store("json", str(tmp_path / "tasks.json"))
+    store.add(tasks)
+    writes, apply_changes = [], store.apply_changes
+    def spy(upserts=(), deletes=(), expected_version=None):
+        writes.append(([t["id"] for t in upserts], list(deletes)))
+        return apply_changes(upserts, deletes, expected_version)
+    store.apply_changes = spy
+    return store, writes
+
+def slots(store, nim=NIM):
+    return [(t["id"], t["date"], t["start"], t["end"]) for t in store.query(user_nim=nim)]
+
+
+def test_missing_task_is_none(tmp_path):
+    store, writes = make_store(tmp_path, [task(1)])
+    assert replan(store, {"op": "delete", "id": "nope"}) is None
+    assert writes == []
+
+def test_delete_pulls_later_tasks_up(tmp_path):
+    # t1 19-20 on the 2nd; t2 on the 3rd and t3 on the 4th move up one after the other
+    store, writes = make_store(tmp_path, [task(1), task(2, day=3), task(3, day=4, start=20), task(9, nim="13523001")])
+    diff = replan(store, {"op": "delete", "id": "t1"}, pull_later=True)
+    assert diff["deleted"] == ["t1"] and diff["added"] == [] and diff["unplaced"] == []
+    assert [(t["id"], t["date"], t["start"]) for t in diff["updated"]] == [("t2", "2026-03-02", "19:00"),
+                                                                          ("t3", "2026-03-03", "19:00")]
+    assert writes == [(["t2", "t3"], ["t1"])]   # one write, only what changed
+    assert slots(store) == [("t2", "2026-03-02", "19:00", "20:00"), ("t3", "2026-03-03", "19:00", "20:00")]
+    assert slots(store, "13523001") == [("t9", "2026-03-02", "19:00", "20:00")]   # other students untouched
+
+def test_delete_without_pull_later_only_deletes(tmp_path):
+    store, writes = make_store(tmp_path, [task(1), task(2, day=3)])
+    diff = replan(store, {"op": "delete", "id": "t1"})
+    assert diff == {"deleted": ["t1"], "updated": [], "added": [], "unplaced": []}
+    assert writes == [([], ["t1"])]
+
+def test_freed_time_takes_queue_items(tmp_path):
+    store, writes = make_store(tmp_path, [task(1, minutes=120), task(2, start=21)])
+    queue = [{"id": "q1", "mapel": "Q1", "jenis": "tugas", "requested_date": "2026-03-01", "duration_minutes": 60,
+              "bobot": 4, "user_nim": NIM},
+             {"id": "q2", "mapel": "Q2", "jenis": "tugas", "requested_date": "2026-03-05", "duration_minutes": 60,
+              "bobot": 8, "user_nim": NIM},   # not before its requested date
+             {"id": "q3", "mapel": "Q3", "jenis": "tugas", "requested_date": "2026-03-01", "duration_minutes": 60,
+              "bobot": 4, "user_nim": "13523001"}]   # someone else's
+    diff = replan(store, {"op": "delete", "id": "t1"}, queue=queue)
+    assert [(t["id"], t["date"], t["start"], t["end"], t["user_nim"]) for t in diff["added"]] == [
+        ("q1", "2026-03-02", "19:00", "20:00", NIM)]
+    assert writes == [(["q1"], ["t1"])]
+
+def test_move_takes_first_free_slot_from_date(tmp_path):
+    store, _ = make_store(tmp_path, [task(1), task(2, day=10), task(3, day=10, start=20)])
+    diff = replan(store, {"op": "move", "id": "t1", "date": date(2026, 3, 10)})
+    assert [(t["id"], t["date"], t["start"], t["end"]) for t in diff["updated"]] == [("t1", "2026-03-10", "21:00", "22:00")]
+
+def test_resize_keeps_start_when_it_fits(tmp_path):
+    store, writes = make_store(tmp_path, [task(1), task(2, start=21)])
+    diff = replan(store, {"op": "resize", "id": "t1", "duration_minutes": 120})
+    assert [(t["start"], t["end"]) for t in diff["updated"]] == [("19:00", "21:00")]
+    diff = replan(store, {"op": "resize", "id": "t1", "duration_minutes": 180})   # runs into t2: moves
+    assert [(t["date"], t["start"], t["end"]) for t in diff["updated"]] == [("2026-03-03", "19:00", "22:00")]
+    assert writes == [(["t1"], []), (["t1"], [])]
@@ -0,0 +1,95 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from studytracker.roster import DB, get_class_occupied_for_date
+from studytracker.scheduler import (
+    ScheduleIndex, find_slot_for_task, first_fit_in_day, schedule_batch, schedule_cohort,
+)
+from studytracker.timeutil import hm_to_minutes, merge_intervals, minutes_to_hm, parse_iso_date
+
+# Every placement engine against the plain day-by-day search the app started
+# with (first_fit_in_day over one student's tasks and classes), on seeded
+# random calendars, so a faster engine can't quietly move a placement.
+
+START = date(2026, 1, 5)
+NIMS = list(DB) + [None, "x"]
+
+
+def make_tasks(rng, n, days=40):
+    tasks = []
+    for i in range(n):
+        s = rng.randrange(0, 24 * 60 - 30, 15)
+        # a few empty or inverted intervals, as hand-edited tasks.json files have
+        dur = rng.choice((0, -10) if rng.random() < 0.02 else (30, 60, 90, 120, 240))
+        tasks.append({"id": f"t{i}", "date": (START + timedelta(days=rng.randrange(days))).isoformat(),
+                      "start": minutes_to_hm(s), "end": minutes_to_hm(min(max(s + dur, 0), 24 * 60)),
+                      "user_nim": rng.choice(NIMS)})
+    return tasks
+
+def make_queue(rng, n):
+    return [{"id": f"q{i}", "mapel": "m", "jenis": "tugas",
+             "requested_date": (START + timedelta(days=rng.randrange(30))).isoformat(),
+             "duration_minutes": rng.choice((30, 60, 90, 120, 200)), "user_nim": rng.choice(NIMS)} for i in range(n)]
+
+def reference_slot(tasks, nim, requested_date, duration_minutes, ignore_task_id, night_start, night_end, max_days):
+    d = requested_date
+    for _ in range(max_days):
+        occ = [[hm_to_minutes(t["start"]), hm_to_minutes(t["end"])] for t in tasks
+               if t["user_nim"] == nim and t["date"] == d.isoformat() and t["id"] != ignore_task_id]
+        start = first_fit_in_day(merge_intervals(occ + get_class_occupied_for_date(nim, d)), duration_minutes,
+                                 night_start, night_end)
+        if start is not None:
+            return (d, minutes_to_hm(start), minutes_to_hm(start + duration_minutes))
+        d += timedelta(days=1)
+    return None
+
+def reference_batch(tasks, queue, default_nim, night_start, night_end, max_days):
+    tasks, placed = list(tasks), []
+    for it in queue:
+        nim = it.get("user_nim") or default_nim or None
+        slot = reference_slot(tasks, nim, parse_iso_date(it["requested_date"]), it["duration_minutes"], None,
+                              night_start, night_end, max_days)
+        if slot:
+            t = {"id": it["id"], "date": slot[0].isoformat(), "start": slot[1], "end": slot[2], "user_nim": nim}
+            tasks.append(t)
+            placed.append(t)
+    return placed
+
+def placements(tasks):
+    return [(t["id"], t["date"], t["start"], t["end"], t["user_nim"]) for t in tasks]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_slot_search_matches_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(60):
+        tasks = make_tasks(rng, rng.choice((0, 5, 50, 300)))
+        index = ScheduleIndex(tasks)
+        args = (rng.choice(NIMS), START + timedelta(days=rng.randrange(40)), rng.choice((0, 1, 30, 60, 90, 200, 300)))
+        kwargs = dict(ignore_task_id=rng.choice((None, "t1", "t3")), night_start=rng.choice((0, 17, 19, 22, 23)) * 60,
+                      night_end=rng.choice((20, 23, 24)) * 60, max_days=rng.choice((0, 1, 7, 30)))
+        expected = reference_slot(tasks, *args, **kwargs)
+        assert find_slot_for_task(tasks, *args, **kwargs) == expected
+        assert find_slot_for_task(None, *args, index=index, **kwargs) == expected
+
+@pytest.mark.parametrize("seed", range(4))
+def test_batch_matches_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(15):
+        tasks, queue = make_tasks(rng, rng.choice((0, 20, 200))), make_queue(rng, rng.choice((1, 10, 40)))
+        kwargs = dict(night_start=rng.choice((0, 17, 19, 22)) * 60, night_end=rng.choice((20, 23, 24)) * 60,
+                      max_days=rng.choice((1, 7, 30)))
+        default_nim = rng.choice((None, NIMS[0]))
+        placed, unplaced = schedule_batch(ScheduleIndex(tasks), queue, default_nim, **kwargs)
+        assert placements(placed) == placements(reference_batch(tasks, queue, default_nim, **kwargs))
+        assert len(placed) + len(unplaced) == len(queue)
+
+def test_cohort_matches_batch():
+    rng = random.Random(12)
+    tasks, queue = make_tasks(rng, 300), make_queue(rng, 60)
+    expected, expected_unplaced = schedule_batch(ScheduleIndex(tasks), queue, max_days=7)
+    placed, unplaced = schedule_cohort(tasks, queue, max_days=7, workers=2)
+    assert placements(placed) == placements(expected)
+    assert [it["id"] for it in unplaced] == [it["id"] for it in expected_unplaced]
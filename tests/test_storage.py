@@ -0,0 +1,158 @@
+import multiprocessing
+import threading
+from datetime import date
+
+import pytest
+
+from studytracker.scheduler import generate
+from studytracker import metrics, storage
+from studytracker.storage import open_task_store
+from studytracker.timeutil import hm_to_minutes
+
+BACKENDS = ("json", "log", "sqlite")
+NIM = "16725186"
+
+
+def queue_item(i):
+    return {"id": f"q{i}", "mapel": f"M{i}", "jenis": "tugas", "requested_date": date(2026, 3, 2).isoformat(),
+            "deadline": "", "prioritas": 2, "kesulitan": 2, "bobot": 4, "duration_minutes": 30, "user_nim": NIM}
+
+def overlaps(tasks):
+    by_day = {}
+    for t in tasks:
+        by_day.setdefault((t["user_nim"], t["date"]), []).append((hm_to_minutes(t["start"]), hm_to_minutes(t["end"])))
+    return [(key, a, b) for key, ivs in by_day.items() for a, b in zip(sorted(ivs), sorted(ivs)[1:]) if b[0] < a[1]]
+
+def generate_many(backend, path, worker, n, start, errors=None):
+    store = open_task_store(backend, path)
+    start.wait()
+    for i in range(n):
+        try:
+            generate(store, [queue_item(f"{worker}-{i}")], max_days=60)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append(e)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_concurrent_generate_keeps_every_placement(backend, tmp_path):
+    # several processes (and sessions in one process) placing into the same nights
+    path = str(tmp_path / "tasks.json")
+    open_task_store(backend, path)
+    start, errors = multiprocessing.Event(), []
+    procs = [multiprocessing.Process(target=generate_many, args=(backend, path, w, 15, start)) for w in range(6)]
+    threads = [threading.Thread(target=generate_many, args=(backend, path, f"t{w}", 15, start, errors)) for w in range(2)]
+    for p in procs + threads:
+        p.start()
+    start.set()
+    for p in procs + threads:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs) and errors == []
+    tasks = open_task_store(backend, path).load()
+    assert len(tasks) == 120
+    assert overlaps(tasks) == []
+
+def crash_on(store, calls):
+    # the store's n-th _replace_log() call raises, as if the process died there
+    replace, seen = store._replace_log, []
+    def _replace_log(data):
+        seen.append(data)
+        if len(seen) == calls:
+            raise KeyboardInterrupt
+        return replace(data)
+    store._replace_log = _replace_log
+
+@pytest.mark.parametrize("calls", (1, 2))
+def test_log_save_survives_a_crash(calls, tmp_path):
+    # deleted tasks must not come back from the old log whichever step save() died at
+    path, log_path = str(tmp_path / "tasks.json"), str(tmp_path / "tasks.log.jsonl")
+    store = storage.LogTaskStore(path, log_path)
+    store.add([dict(queue_item(1), id="x"), dict(queue_item(2), id="y")])
+    store.delete("x")
+    crash_on(store, calls)
+    with pytest.raises(KeyboardInterrupt):
+        store.save([dict(queue_item(3), id="z")])
+    # died before anything was replaced, or after the new snapshot (old log still there)
+    assert [t["id"] for t in storage.LogTaskStore(path, log_path).load()] == (["y"] if calls == 1 else ["z"])
+
+def test_log_save_crash_between_log_and_snapshot(tmp_path, monkeypatch):
+    # the new log is in place, the snapshot is still the old one
+    path, log_path = str(tmp_path / "tasks.json"), str(tmp_path / "tasks.log.jsonl")
+    store = storage.LogTaskStore(path, log_path)
+    store.add([dict(queue_item(1), id="x"), dict(queue_item(2), id="y")])
+    store.delete("x")
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(storage, "write_json_atomic", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.save([dict(queue_item(3), id="z")])
+    assert [t["id"] for t in storage.LogTaskStore(path, log_path).load()] == ["z"]
+
+def test_log_reader_follows_a_replaced_log(tmp_path, monkeypatch):
+    # another process's save() died with its new log in place and the snapshot untouched
+    path, log_path = str(tmp_path / "tasks.json"), str(tmp_path / "tasks.log.jsonl")
+    reader, writer = storage.LogTaskStore(path, log_path), storage.LogTaskStore(path, log_path)
+    writer.add([dict(queue_item(i), id=f"a{i}") for i in range(3)])
+    assert len(reader.load()) == 3
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(storage, "write_json_atomic", crash)
+    with pytest.raises(KeyboardInterrupt):
+        writer.save([dict(queue_item(i), id=f"b{i}") for i in range(6)])   # a longer log than reader has read
+    assert sorted(t["id"] for t in reader.load()) == [f"b{i}" for i in range(6)]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_user_nim_tuple_filter(backend, tmp_path):
+    store = open_task_store(backend, str(tmp_path / "tasks.json"))
+    owners = ["16725186", "13523001", None, "16725186", "19623002"]
+    store.add([dict(queue_item(i), id=f"t{i}", date="2026-03-02", start=f"{19 + i % 4}:00", end=f"{19 + i % 4}:30",
+                    user_nim=nim) for i, nim in enumerate(owners)])
+    for keep in (("16725186",), ("16725186", None), (None,), ("13523001", "19623002"), ()):
+        expected = [f"t{i}" for i, nim in enumerate(owners) if nim in keep]
+        assert sorted(t["id"] for t in store.query(user_nim=keep)) == expected
+        assert sorted(r.id for r in store.records(user_nim=keep, date_from=date(2026, 3, 1))) == expected
+        assert store.page(user_nim=keep, limit=2)[1] == len(expected)
+    assert len(store.query(user_nim="16725186")) == 2 and len(store.query()) == 5
+
+def test_generate_reads_only_the_queues_students(tmp_path):
+    store = open_task_store("json", str(tmp_path / "tasks.json"))
+    store.add([dict(queue_item(i), id=f"o{i}", date="2026-03-02", start="19:00", end="23:00", user_nim=f"other{i}")
+               for i in range(5)])
+    asked, records = [], store.records
+    store.records = lambda user_nim=None, **kwargs: asked.append(user_nim) or records(user_nim, **kwargs)
+    _, placed, _ = generate(store, [queue_item(1), dict(queue_item(2), user_nim=None)], max_days=7)
+    assert [set(nims) for nims in asked] == [{NIM, None}]
+    assert [(t["date"], t["start"]) for t in placed] == [("2026-03-02", "19:00")] * 2   # other students don't block
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_writes_record_store_size(backend, tmp_path):
+    store = open_task_store(backend, str(tmp_path / "tasks.json"))
+    metrics.enable()
+    metrics.reset()
+    try:
+        store.add([dict(queue_item(i), id=f"t{i}", date="2026-03-02", start="19:00", end="19:30") for i in range(3)])
+        assert metrics.snapshot()["gauges"]["store.size"] == 3
+        store.delete("t0")
+        assert metrics.snapshot()["gauges"]["store.size"] == 2
+        store.save([])
+        assert metrics.snapshot()["gauges"]["store.size"] == 0
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+
+@pytest.mark.parametrize("backend", ("json", "log"))
+def test_count_does_not_load_every_task(backend, tmp_path):
+    path = str(tmp_path / "tasks.json")
+    store = open_task_store(backend, path)
+    store.add([dict(queue_item(i), id=f"t{i}", date=f"2026-03-0{1 + i % 3}", start="19:00", end="19:30")
+               for i in range(5)])
+    store.delete("t4")
+    open_task_store(backend, path).add([dict(queue_item(9), id="t9", date="2026-03-09", start="19:00", end="19:30")])
+    assert store.page(limit=0)[1] == 5   # another writer's change is seen (json reads the file once here)
+    def full_read(*args, **kwargs):
+        raise AssertionError("full read")
+    store.load = store.query = full_read
+    assert store.page(limit=0)[1] == 5
+    if backend == "log":
+        assert store.page(date_from=date(2026, 3, 2), limit=1) == ([store.get("t1")], 3)
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from studytracker.storage import WriteBehindError, WriteBehindStore, open_task_store
+
+BACKENDS = ("json", "log", "sqlite")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def task(i, nim="16725186"):
+    return {"id": f"t{i}", "mapel": f"M{i}", "jenis": "tugas", "date": "2026-03-02", "start": f"{19 + i % 4}:00",
+            "end": f"{19 + i % 4}:30", "duration_minutes": 30, "user_nim": nim}
+
+def gated(store):
+    # store whose writes wait for gate.set(); entered is set once one is waiting
+    gate, entered, write = threading.Event(), threading.Event(), store.apply_changes
+    def apply_changes(*args, **kwargs):
+        entered.set()
+        gate.wait(10)
+        return write(*args, **kwargs)
+    store.apply_changes = apply_changes
+    return gate, entered
+
+def in_thread(fn):
+    out = {}
+    def run():
+        try:
+            out["result"] = fn()
+        except Exception as e:
+            out["error"] = e
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    return out
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_reads_see_queued_writes(backend, tmp_path):
+    path = str(tmp_path / "tasks.json")
+    inner = open_task_store(backend, path)
+    inner.add([task(1), task(2)])
+    gate, entered = gated(inner)
+    store = WriteBehindStore(inner)
+    store.add([task(3)])
+    store.update(dict(task(1), mapel="baru"))
+    store.delete("t2")
+    entered.wait(10)
+    assert open_task_store(backend, path).get("t3") is None   # not on disk yet
+    assert store.get("t1")["mapel"] == "baru" and store.get("t2") is None and store.get("t3") is not None
+    assert sorted(t["id"] for t in store.query(user_nim="16725186")) == ["t1", "t3"]
+    assert store.page(offset=0, limit=10)[1] == 2
+    gate.set()
+    assert store.flush(10)
+    assert store.pending() == 0
+    assert sorted(t["id"] for t in open_task_store(backend, path).load()) == ["t1", "t3"]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_pending_writes_are_flushed_at_exit(backend, tmp_path):
+    path = str(tmp_path / "tasks.json")
+    script = (
+        "import sys, time\n"
+        "from studytracker.storage import WriteBehindStore, open_task_store\n"
+        "inner = open_task_store(sys.argv[1], sys.argv[2])\n"
+        "write = inner.apply_changes\n"
+        "inner.apply_changes = lambda *a, **k: (time.sleep(0.3), write(*a, **k))\n"
+        "store = WriteBehindStore(inner)\n"
+        f"store.add([{task(1)!r}])\n"
+        f"store.add([{task(2)!r}])\n"
+        "assert store.pending()\n"
+    )
+    subprocess.run([sys.executable, "-c", script, backend, path], cwd=ROOT, check=True, timeout=60)
+    assert sorted(t["id"] for t in open_task_store(backend, path).load()) == ["t1", "t2"]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_dropped_write_is_reported_to_its_writer_only(backend, tmp_path):
+    path = str(tmp_path / "tasks.json")
+    inner = open_task_store(backend, path)
+    gate, entered = gated(inner)
+    store = WriteBehindStore(inner)
+    store.add([task(1)])   # the worker holds this one at the gate
+    entered.wait(10)
+    def planned_on_old_data():
+        store.add([task(2)], expected_version=store.version())
+        return store.take_tickets()
+    a = in_thread(planned_on_old_data)["result"]
+    open_task_store(backend, path).add([task(3, nim="13523001")])   # another process writes meanwhile
+    def unchecked():
+        store.add([task(4)])
+        return store.flush(10)
+    gate.set()
+    b = in_thread(unchecked)
+    assert b == {"result": True}   # the unrelated writer is not told about a's drop
+    assert isinstance(a[0].exception(10), WriteBehindError)
+    assert store.flush(10)   # nor is this thread, whose own write went through
+    assert sorted(t["id"] for t in open_task_store(backend, path).load()) == ["t1", "t3", "t4"]
+    assert store.get("t2") is None   # the dropped write's overlay is gone too